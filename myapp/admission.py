@@ -0,0 +1,165 @@
+import functools
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.http import JsonResponse
+from django.urls import Resolver404, resolve
+
+from .metrics import registry
+
+PAGE = 'page'
+WRITE = 'write'
+# Долгие потоки и служебные эндпоинты не занимают слоты и не ограничиваются.
+EXEMPT_ROUTES = frozenset({'events', 'metrics'})
+
+
+def route_class(request):
+    try:
+        match = resolve(request.path_info)
+    except Resolver404:
+        return None, None
+    if match.url_name in EXEMPT_ROUTES:
+        return match, None
+    if match.url_name in settings.ADMISSION_WRITE_ROUTES:
+        return match, WRITE
+    if match.url_name == 'preferences' and request.method == 'POST':
+        return match, WRITE
+    return match, PAGE
+
+
+def queue_time(request, now):
+    # X-Request-Start от nginx/балансировщика: «t=1700000000.123» в секундах, мс или мкс.
+    value = request.headers.get('X-Request-Start', '').removeprefix('t=')
+    try:
+        started = float(value)
+    except ValueError:
+        return None
+    if started > 1e14:
+        started /= 1e6
+    elif started > 1e11:
+        started /= 1e3
+    return max(0.0, now - started)
+
+
+def client_key(request):
+    # Ключ — адрес клиента. Даже подписанный profile_id сервер выдаёт по первой записи без cookie,
+    # так что, собрав несколько id, клиент получал бы по полному ведру на каждый.
+    header = settings.ADMISSION_CLIENT_ADDRESS_HEADER
+    address = request.META.get(header) if header else None
+    if address:
+        # В X-Forwarded-For начало списка пишет клиент, последний адрес добавил доверенный прокси.
+        return 'addr:' + address.rsplit(',', 1)[-1].strip()
+    return 'addr:' + request.META.get('REMOTE_ADDR', '')
+
+
+class TokenBuckets:
+    def __init__(self, rate, burst, maxsize):
+        self.rate = rate
+        self.burst = burst
+        self.maxsize = maxsize
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def take(self, key, now):
+        # Возвращает 0, если токен выдан, иначе — через сколько секунд он появится.
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                tokens = self.burst
+                while len(self._buckets) >= self.maxsize:
+                    # Вытесняется самый давний клиент: его ведро всё равно успело бы наполниться.
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            if tokens < 1:
+                self._buckets[key] = [tokens, now]
+                return (1 - tokens) / self.rate
+            self._buckets[key] = [tokens - 1, now]
+            return 0.0
+
+
+class AdmissionController:
+    def __init__(self):
+        self.buckets = TokenBuckets(
+            settings.ADMISSION_WRITE_RATE, settings.ADMISSION_WRITE_BURST, settings.ADMISSION_CLIENT_TABLE_SIZE
+        )
+        self.in_flight = {PAGE: 0, WRITE: 0}
+        self._lock = threading.Lock()
+
+    def admit(self, request, route):
+        now = time.time()
+        waited = queue_time(request, now)
+        if waited is not None:
+            registry.observe('myapp_queue_time_seconds', (('class', route),), waited)
+            limit = settings.ADMISSION_WRITE_MAX_QUEUE_TIME if route == WRITE else settings.ADMISSION_PAGE_MAX_QUEUE_TIME
+            if waited > limit:
+                # Клиент уже, скорее всего, не ждёт ответа — не тратим на него воркер.
+                return self._reject(route, 'queue_time', 503, 1)
+
+        if route == WRITE:
+            retry_after = self.buckets.take(client_key(request), time.monotonic())
+            if retry_after:
+                return self._reject(route, 'rate_limit', 429, retry_after)
+
+        with self._lock:
+            pages = self.in_flight[PAGE]
+            if route == PAGE:
+                overloaded = pages >= settings.ADMISSION_PAGE_MAX_IN_FLIGHT
+            else:
+                # Запись уступает страницам: при занятых страницами воркерах её отклоняют первой.
+                overloaded = (
+                    self.in_flight[WRITE] >= settings.ADMISSION_WRITE_MAX_IN_FLIGHT
+                    or pages >= settings.ADMISSION_WRITE_YIELD_PAGES
+                )
+            if not overloaded:
+                self.in_flight[route] += 1
+                return None
+        return self._reject(route, 'in_flight', 503, 1)
+
+    def release(self, route):
+        with self._lock:
+            self.in_flight[route] -= 1
+
+    def release_on_close(self, response, route):
+        # Слот занят, пока сервер не закрыл ответ: потоковое тело отдаётся уже после выхода из middleware.
+        response._resource_closers.append(functools.partial(self.release, route))
+        return response
+
+    def _reject(self, route, reason, status, retry_after):
+        registry.inc('myapp_admission_rejected_total', (('class', route), ('reason', reason)))
+        message = 'Слишком много запросов' if status == 429 else 'Сервер перегружен, повторите позже'
+        response = JsonResponse({'error': message}, status=status)
+        response['Retry-After'] = str(max(1, math.ceil(retry_after)))
+        # Отказы считаются в метриках; запись каждого в лог django.request при флуде сама стала бы нагрузкой.
+        response._has_been_logged = True
+        return response
+
+    def metrics(self):
+        lines = ['# TYPE myapp_in_flight_requests gauge']
+        lines.extend(f'myapp_in_flight_requests{{class="{route}"}} {count}' for route, count in self.in_flight.items())
+        lines.append('# TYPE myapp_admission_clients gauge')
+        lines.append(f'myapp_admission_clients {len(self.buckets)}')
+        return lines
+
+
+_controller = None
+_controller_lock = threading.Lock()
+
+
+def get_controller():
+    global _controller
+    controller = _controller
+    if controller is None:
+        with _controller_lock:
+            if _controller is None:
+                _controller = AdmissionController()
+                registry.add_collector(_controller.metrics)
+            controller = _controller
+    return controller
@@ -3,4 +3,4 @@ from django.apps import AppConfig
 
 class MyappConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'  # pyright: ignore[reportAssignmentType]
-    name = 'myapp'
\ No newline at end of file
+    name = 'myapp'
@@ -0,0 +1,59 @@
+import mimetypes
+import re
+from pathlib import Path
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+from django.views.static import was_modified_since
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'public, no-cache'
+
+# Имя, выданное ManifestStaticFilesStorage: style.0123456789ab.css
+_HASHED_NAME_RE = re.compile(r'\.[0-9a-f]{12}\.[^./]+$')
+_ZERO_QUALITY_RE = re.compile(r'q\s*=\s*0(?:\.0*)?')
+
+
+def accepts_gzip(request):
+    # Явная запись gzip важнее «*» независимо от порядка: «*;q=0, gzip» gzip разрешает.
+    accepted = {}
+    for coding in request.headers.get('Accept-Encoding', '').split(','):
+        name, _, params = coding.partition(';')
+        name = name.strip().lower()
+        if name in ('gzip', '*'):
+            accepted.setdefault(name, not _ZERO_QUALITY_RE.fullmatch(params.strip().lower()))
+    return accepted.get('gzip', accepted.get('*', False))
+
+
+@require_safe
+def serve_static(request, path):
+    try:
+        fullpath = Path(safe_join(settings.STATIC_ROOT, path))
+    except ValueError:
+        raise Http404('Файл не найден')
+    if not fullpath.is_file():
+        raise Http404('Файл не найден')
+
+    content_type, encoding = mimetypes.guess_type(fullpath.name)
+    hashed = bool(_HASHED_NAME_RE.search(fullpath.name))
+    stat = fullpath.stat()
+
+    if not hashed and not was_modified_since(request.headers.get('If-Modified-Since'), stat.st_mtime):
+        return HttpResponseNotModified()
+
+    compressed = fullpath.with_name(fullpath.name + '.gz')
+    has_compressed = encoding is None and compressed.is_file()
+    served = compressed if has_compressed and accepts_gzip(request) else fullpath
+
+    response = FileResponse(served.open('rb'), content_type=content_type or 'application/octet-stream')
+    if served is compressed:
+        response.headers['Content-Encoding'] = 'gzip'
+    response.headers['Last-Modified'] = http_date(stat.st_mtime)
+    response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL if hashed else REVALIDATE_CACHE_CONTROL
+    if has_compressed:
+        patch_vary_headers(response, ('Accept-Encoding',))
+    return response
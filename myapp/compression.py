@@ -0,0 +1,127 @@
+import time
+import zlib
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+from .assets import accepts_gzip
+from .cache import LRUCache
+from .metrics import registry
+
+# 16 + MAX_WBITS: zlib пишет gzip-заголовок с нулевым mtime, одинаковое тело даёт одинаковые байты.
+GZIP_WBITS = 31
+
+compressed_cache = LRUCache(getattr(settings, 'COMPRESSION_CACHE_SIZE', 256))
+
+
+def _content_type(response):
+    return response.get('Content-Type', '').partition(';')[0].strip().lower()
+
+
+def is_compressible(request, response):
+    if response.status_code != 200 or response.has_header('Content-Encoding'):
+        return False
+    # Статику отдаёт serve_static: её .gz собраны при collectstatic, а мелкие файлы сжимать незачем.
+    if request.path.startswith(settings.STATIC_URL):
+        return False
+    if _content_type(response) not in settings.COMPRESSION_CONTENT_TYPES:
+        return False
+    return response.streaming or len(response.content) >= settings.COMPRESSION_MIN_SIZE
+
+
+def _compressor():
+    return zlib.compressobj(settings.COMPRESSION_LEVEL, zlib.DEFLATED, GZIP_WBITS)
+
+
+def _record(size_in, size_out, duration):
+    registry.inc('myapp_compression_bytes_total', (('stage', 'in'),), size_in)
+    registry.inc('myapp_compression_bytes_total', (('stage', 'out'),), size_out)
+    registry.inc('myapp_compression_seconds_total', (), duration)
+
+
+def compress(content):
+    started = time.perf_counter()
+    compressor = _compressor()
+    compressed = compressor.compress(content) + compressor.flush()
+    _record(len(content), len(compressed), time.perf_counter() - started)
+    return compressed
+
+
+def compress_stream(chunks):
+    compressor = _compressor()
+    for chunk in chunks:
+        started = time.perf_counter()
+        # Каждая порция дожимается до границы байта, чтобы клиент получал её сразу, а не в конце ответа.
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH) if chunk else b''
+        _record(len(chunk), len(data), time.perf_counter() - started)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+async def acompress_stream(chunks):
+    compressor = _compressor()
+    async for chunk in chunks:
+        started = time.perf_counter()
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH) if chunk else b''
+        _record(len(chunk), len(data), time.perf_counter() - started)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def _compressed_body(request, response):
+    content = response.content
+    etag = response.get('ETag', '')
+    # Хранятся только JSON-ответы, тело которых целиком определяется сильным ETag.
+    # HTML с {% csrf_token %} при каждом рендере получает новый маскированный токен и никогда не повторяется.
+    cacheable = (
+        etag.startswith('"')
+        and _content_type(response) == 'application/json'
+        and 'no-store' not in response.get('Cache-Control', '')
+        and not request.META.get('CSRF_COOKIE_USED')
+    )
+    if not cacheable:
+        return compress(content)
+    return compressed_cache.get_or_set((settings.COMPRESSION_LEVEL, etag), lambda: compress(content))
+
+
+def compress_response(request, response):
+    if not is_compressible(request, response):
+        return response
+    patch_vary_headers(response, ('Accept-Encoding',))
+    if not accepts_gzip(request):
+        return response
+
+    if response.streaming:
+        if response.is_async:
+            response.streaming_content = acompress_stream(response.streaming_content)
+        else:
+            response.streaming_content = compress_stream(response.streaming_content)
+        response.headers.pop('Content-Length', None)
+    else:
+        compressed = _compressed_body(request, response)
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response.headers['Content-Length'] = str(len(compressed))
+
+    # Сжатое тело побайтно отличается от несжатого, поэтому ETag становится слабым — как в GZipMiddleware.
+    etag = response.get('ETag')
+    if etag and etag.startswith('"'):
+        response.headers['ETag'] = 'W/' + etag
+    response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+
+def _compression_metrics():
+    stats = compressed_cache.stats()
+    lines = []
+    for name, kind in (('hits', 'counter'), ('misses', 'counter'), ('evictions', 'counter'), ('size', 'gauge')):
+        metric = f'myapp_compression_cache_{name}' + ('_total' if kind == 'counter' else '')
+        lines.append(f'# TYPE {metric} {kind}')
+        lines.append(f'{metric} {stats[name]}')
+    return lines
+
+
+registry.add_collector(_compression_metrics)
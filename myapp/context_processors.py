@@ -1,13 +1,13 @@
+from .preferences import Preferences
+
+
 def user_preferences(request):
-    theme = getattr(request, 'theme', 'light')
-    language = getattr(request, 'LANGUAGE_CODE', None)
-    if not language:
-        language = request.COOKIES.get('django_language', 'en')
-    favorite_teams = getattr(request, 'favorite_teams', [])
+    preferences = getattr(request, 'preferences', None) or Preferences(request)
+    favorite_teams = preferences.favorites
     
     return {
-        'current_theme': theme,
-        'current_language': language,
+        'current_theme': preferences.theme,
+        'current_language': preferences.language,
         'favorite_teams_ids': favorite_teams,
         'favorite_count': len(favorite_teams),
-    }
\ No newline at end of file
+    }
@@ -0,0 +1,209 @@
+import asyncio
+import atexit
+import json
+import logging
+import os
+from collections import OrderedDict
+from pathlib import Path
+
+from django.conf import settings
+
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+EVENT_KINDS = frozenset({'score', 'standings', 'news'})
+# Для этих событий важно только последнее состояние: медленный клиент получит свежее, а не всю очередь.
+COALESCED_EVENTS = frozenset({'score', 'standings'})
+SOCKET_PATTERN = 'events-*.sock'
+HEARTBEAT = b': ping\n\n'
+HEARTBEAT_KEY = 'heartbeat'
+
+
+def parse_event(message):
+    if not isinstance(message, dict):
+        raise ValueError('Событие должно быть объектом')
+    kind = message.get('event')
+    if kind not in EVENT_KINDS:
+        raise ValueError(f'Неизвестный тип события: {kind!r}')
+    team_id = message.get('team_id')
+    if team_id is not None and (not isinstance(team_id, int) or isinstance(team_id, bool) or team_id < 1):
+        raise ValueError('Неверный ID команды')
+    data = message.get('data', {})
+    if not isinstance(data, dict):
+        raise ValueError('Поле data должно быть объектом')
+    return kind, data, team_id
+
+
+def encode_event(event_id, kind, data, team_id=None):
+    if team_id is not None:
+        data = {'team_id': team_id, **data}
+    return f'id: {event_id}\nevent: {kind}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n'.encode()
+
+
+class Subscriber:
+    __slots__ = ('team_ids', 'maxsize', 'dropped', '_pending', '_ready')
+
+    def __init__(self, team_ids, maxsize):
+        self.team_ids = team_ids
+        self.maxsize = maxsize
+        self.dropped = 0
+        self._pending = OrderedDict()
+        self._ready = asyncio.Event()
+
+    def wants(self, team_id):
+        return self.team_ids is None or team_id is None or team_id in self.team_ids
+
+    def push(self, key, payload):
+        pending = self._pending
+        dropped = False
+        if key in pending:
+            pending.move_to_end(key)
+        elif len(pending) >= self.maxsize:
+            pending.popitem(last=False)
+            self.dropped += 1
+            dropped = True
+        pending[key] = payload
+        self._ready.set()
+        return dropped
+
+    async def next_chunk(self):
+        if not self._pending:
+            await self._ready.wait()
+        self._ready.clear()
+        chunk = b''.join(self._pending.values())
+        self._pending.clear()
+        return chunk
+
+
+class EventHub:
+    # Все методы, кроме publish_threadsafe, вызываются только из цикла событий ASGI-воркера.
+    def __init__(self):
+        self._subscribers = set()
+        self._loop = None
+        self._server = None
+        self._heartbeat = None
+        self._listener_loop = None
+        self._next_id = 0
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+
+    def __len__(self):
+        return len(self._subscribers)
+
+    def subscribe(self, team_ids=None):
+        self._loop = asyncio.get_running_loop()
+        if self._heartbeat is None or self._heartbeat.done() or self._heartbeat.get_loop() is not self._loop:
+            self._heartbeat = self._loop.create_task(self._send_heartbeats(settings.EVENTS_HEARTBEAT))
+        subscriber = Subscriber(team_ids, settings.EVENTS_QUEUE_SIZE)
+        self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        self._subscribers.discard(subscriber)
+
+    def publish(self, kind, data, team_id=None):
+        self._next_id += 1
+        payload = encode_event(self._next_id, kind, data, team_id)
+        key = (kind, team_id) if kind in COALESCED_EVENTS else self._next_id
+        delivered = 0
+        for subscriber in self._subscribers:
+            if subscriber.wants(team_id):
+                delivered += 1
+                if subscriber.push(key, payload):
+                    self.dropped += 1
+        self.published += 1
+        self.delivered += delivered
+        return delivered
+
+    async def _send_heartbeats(self, interval):
+        # Один таймер на воркер вместо таймаута на каждом подключении; ping не копится в очереди.
+        while self._subscribers:
+            await asyncio.sleep(interval)
+            for subscriber in self._subscribers:
+                subscriber.push(HEARTBEAT_KEY, HEARTBEAT)
+
+    def publish_threadsafe(self, kind, data, team_id=None):
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return False
+        loop.call_soon_threadsafe(self.publish, kind, data, team_id)
+        return True
+
+    async def ensure_listener(self):
+        loop = asyncio.get_running_loop()
+        if self._listener_loop is loop or not settings.EVENTS_SOCKET_DIR:
+            return
+        self._listener_loop = loop
+        directory = Path(settings.EVENTS_SOCKET_DIR)
+        path = directory / f'events-{os.getpid()}.sock'
+        try:
+            directory.mkdir(parents=True, exist_ok=True)
+            path.unlink(missing_ok=True)
+            self._server = await asyncio.start_unix_server(self._handle_publisher, path=str(path))
+        except OSError:
+            self._listener_loop = None
+            logger.exception('Не удалось открыть сокет событий %s', path)
+            return
+        atexit.register(path.unlink, missing_ok=True)
+
+    async def _handle_publisher(self, reader, writer):
+        try:
+            async for line in reader:
+                if not line.strip():
+                    continue
+                try:
+                    kind, data, team_id = parse_event(json.loads(line))
+                except ValueError as e:
+                    logger.warning('Отклонено событие издателя: %s', e)
+                    continue
+                self.publish(kind, data, team_id)
+        finally:
+            writer.close()
+
+
+hub = EventHub()
+
+
+def publish_event(kind, data, team_id=None):
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is not None and running is hub._loop:
+        hub.publish(kind, data, team_id)
+        return True
+    return hub.publish_threadsafe(kind, data, team_id)
+
+
+async def stream_events(team_ids):
+    subscriber = hub.subscribe(team_ids)
+    try:
+        yield f'retry: {settings.EVENTS_RETRY_MS}\n\n'.encode()
+        while True:
+            yield await subscriber.next_chunk()
+    finally:
+        hub.unsubscribe(subscriber)
+
+
+def socket_paths():
+    if not settings.EVENTS_SOCKET_DIR:
+        return []
+    return sorted(Path(settings.EVENTS_SOCKET_DIR).glob(SOCKET_PATTERN))
+
+
+def _events_metrics():
+    return [
+        '# TYPE myapp_events_subscribers gauge',
+        f'myapp_events_subscribers {len(hub)}',
+        '# TYPE myapp_events_published_total counter',
+        f'myapp_events_published_total {hub.published}',
+        '# TYPE myapp_events_delivered_total counter',
+        f'myapp_events_delivered_total {hub.delivered}',
+        '# TYPE myapp_events_dropped_total counter',
+        f'myapp_events_dropped_total {hub.dropped}',
+    ]
+
+
+registry.add_collector(_events_metrics)
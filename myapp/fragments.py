@@ -0,0 +1,115 @@
+import json
+from operator import itemgetter
+
+from django.conf import settings
+from django.template.loader import render_to_string
+from django.utils import translation
+from django.utils.safestring import mark_safe
+
+from .cache import LRUCache
+from .models import TEAM_FIELDS
+from .pagination import encode_cursor
+from .search import normalize
+
+card_cache = LRUCache(getattr(settings, 'TEAM_CARD_CACHE_SIZE', 4096))
+grid_cache = LRUCache(getattr(settings, 'TEAM_GRID_CACHE_SIZE', 512))
+search_cache = LRUCache(getattr(settings, 'TEAM_SEARCH_CACHE_SIZE', 1024))
+serializer_cache = LRUCache(getattr(settings, 'TEAM_SERIALIZER_CACHE_SIZE', 64))
+
+# Поля команды в ответах поиска; «about» отдаёт только карточка команды.
+SEARCH_FIELDS = tuple(field for field in TEAM_FIELDS if field != 'about')
+
+
+class InvalidFields(ValueError):
+    pass
+
+
+def parse_fields(value):
+    if not value:
+        return SEARCH_FIELDS
+    requested = {field.strip() for field in value.split(',')} - {''}
+    unknown = requested.difference(SEARCH_FIELDS)
+    if unknown:
+        raise InvalidFields('Неизвестные поля: ' + ', '.join(sorted(unknown)))
+    # id нужен всегда — по нему сопоставляется избранное; порядок как в модели, чтобы «a,b» и «b,a» делили кеш.
+    return tuple(field for field in SEARCH_FIELDS if field == 'id' or field in requested)
+
+
+class TeamSerializer:
+    # Собирается один раз на версию каталога и набор полей: колонки выбираются itemgetter,
+    # JSON каждой команды кодируется при первом обращении, дальше ответы только склеивают готовые байты.
+    def __init__(self, fields):
+        self.fields = fields
+        getter = itemgetter(*(TEAM_FIELDS.index(field) for field in fields))
+        self.values = getter if len(fields) > 1 else lambda team: (getter(team),)
+        self.columns = json.dumps(fields).encode()
+        self._objects = {}
+        self._rows = {}
+
+    def object(self, team):
+        data = self._objects.get(team.id)
+        if data is None:
+            data = self._objects[team.id] = json.dumps(dict(zip(self.fields, self.values(team)))).encode()
+        return data
+
+    def row(self, team):
+        data = self._rows.get(team.id)
+        if data is None:
+            data = self._rows[team.id] = json.dumps(self.values(team)).encode()
+        return data
+
+
+def get_team_serializer(catalog, fields):
+    return serializer_cache.get_or_set((catalog.version, fields), lambda: TeamSerializer(fields))
+
+
+def render_team_card(catalog, team, is_favorite, language=None):
+    language = language or translation.get_language()
+    return card_cache.get_or_set(
+        (catalog.version, team.id, language, is_favorite),
+        lambda: render_to_string('team_card.html', {'team': team, 'is_favorite': is_favorite}),
+    )
+
+
+def render_team_grid(catalog, teams, favorite_ids, search_term=''):
+    language = translation.get_language()
+    shown_favorites = frozenset(team.id for team in teams if team.id in favorite_ids)
+    return grid_cache.get_or_set(
+        (catalog.version, language, normalize(search_term).strip(), shown_favorites),
+        lambda: mark_safe(''.join(
+            render_team_card(catalog, team, team.id in favorite_ids, language) for team in teams
+        )),
+    )
+
+
+def serialize_team_search(catalog, search_term, offset=None, limit=None, fields=SEARCH_FIELDS, compact=False):
+    # Тело общее для всех пользователей; избранное дописывается к нему отдельным полем.
+    return search_cache.get_or_set(
+        (catalog.version, normalize(search_term).strip(), offset, limit, fields, compact),
+        lambda: _serialize_team_search(catalog, search_term, offset, limit, fields, compact),
+    )
+
+
+def _serialize_team_search(catalog, search_term, offset, limit, fields, compact):
+    teams = catalog.search(search_term)
+    page = teams if limit is None else teams[offset:offset + limit]
+    serializer = get_team_serializer(catalog, fields)
+    # compact: заголовок колонок и строки-массивы вместо повторения имён полей в каждом объекте.
+    if compact:
+        body = b'{"columns": ' + serializer.columns + b', "teams": [' + b', '.join(map(serializer.row, page)) + b']'
+    else:
+        body = b'{"teams": [' + b', '.join(map(serializer.object, page)) + b']'
+    if limit is not None:
+        end = offset + limit
+        next_cursor = encode_cursor(catalog.version, end) if end < len(teams) else None
+        body += f', "next_cursor": {json.dumps(next_cursor)}, "total": {len(teams)}'.encode()
+    return body, tuple(team.id for team in page)
+
+
+def cache_stats():
+    return {
+        'cards': card_cache.stats(),
+        'grids': grid_cache.stats(),
+        'searches': search_cache.stats(),
+        'serializers': serializer_cache.stats(),
+    }
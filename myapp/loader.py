@@ -0,0 +1,138 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+
+from django.conf import settings
+
+from .models import Team, TeamCatalog, get_catalog, set_catalog
+
+logger = logging.getLogger(__name__)
+
+
+def read_catalog(path):
+    # Файл читается и разбирается целиком: поисковому индексу и деталям команд нужны все поля каждой записи.
+    digest = hashlib.blake2b(digest_size=8)
+    teams = []
+    with open(path, 'rb') as handle:
+        for number, line in enumerate(handle, start=1):
+            digest.update(line)
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                teams.append(Team.from_dict(json.loads(line)))
+            except (ValueError, KeyError, TypeError) as e:
+                raise ValueError(f'{path}:{number}: неверная запись команды ({e})') from e
+    return TeamCatalog(teams, digest.hexdigest())
+
+
+def file_signature(path):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+
+class CatalogWatcher:
+    def __init__(self, path, interval):
+        self.path = path
+        self.interval = interval
+        self.enabled = False
+        self._stop = threading.Event()
+        self._thread = None
+        # Подпись файла, из которого собран текущий каталог; воркер после fork наследует её вместе с каталогом.
+        try:
+            self._signature = file_signature(path)
+        except OSError:
+            self._signature = None
+
+    def start(self):
+        self.enabled = True
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name='catalog-watcher', daemon=True)
+        self._thread.start()
+
+    def suspend(self):
+        # Поток останавливается, но наблюдатель остаётся включённым: после fork его запустит каждый воркер.
+        thread = self._thread
+        if thread is None:
+            return
+        self._stop.set()
+        thread.join()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def restart_after_fork(self):
+        # Потоки не переживают fork: в дочернем процессе наблюдатель запускается заново.
+        if self.enabled:
+            self._stop = threading.Event()
+            self._thread = None
+            self.start()
+
+    def stop(self):
+        self.enabled = False
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.check()
+
+    def reload(self):
+        # Подпись снимается до чтения: если файл изменится во время разбора, следующая проверка перечитает его.
+        signature = file_signature(self.path)
+        catalog = read_catalog(self.path)
+        self._signature = signature
+        set_catalog(catalog)
+        return catalog
+
+    def check(self):
+        try:
+            signature = file_signature(self.path)
+        except OSError:
+            logger.warning('Файл каталога %s недоступен', self.path)
+            return False
+        if signature == self._signature:
+            return False
+        try:
+            catalog = self.reload()
+        except (OSError, ValueError):
+            logger.exception('Не удалось перечитать каталог %s, остаётся текущая версия', self.path)
+            return False
+        logger.info('Каталог перезагружен: %d команд, версия %s', len(catalog), catalog.version)
+        return True
+
+
+_watcher = None
+
+
+def start_watcher(path, interval):
+    global _watcher
+    if _watcher is None:
+        _watcher = CatalogWatcher(path, interval)
+        _watcher.start()
+        os.register_at_fork(after_in_child=_watcher.restart_after_fork)
+    return _watcher
+
+
+def get_watcher():
+    return _watcher
+
+
+def watch_catalog_on_startup():
+    # Как и прогрев, запускается только из точек входа сервера (wsgi.py, asgi.py, serve_prefork):
+    # management-командам не нужны ни загруженный заранее каталог, ни поток наблюдателя.
+    interval = getattr(settings, 'TEAMS_DATA_RELOAD_INTERVAL', 0)
+    if not interval:
+        return None
+    get_catalog()
+    return start_watcher(settings.TEAMS_DATA_FILE, interval)
+
+
+def reload_catalog(path):
+    # Каталог и подпись файла у наблюдателя меняются вместе, иначе он сочтёт файл изменённым и перечитает его ещё раз.
+    if _watcher is not None and _watcher.path == path:
+        return _watcher.reload()
+    catalog = read_catalog(path)
+    set_catalog(catalog)
+    return catalog
@@ -0,0 +1,167 @@
+import itertools
+import json
+import statistics
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+
+from myapp.metrics import measure_overhead
+from myapp.models import TeamCatalog, get_catalog, set_catalog
+from myapp.preferences import FAVORITES_COOKIE, LANGUAGE_COOKIE, encode_favorites
+
+VIEWS = ('home', 'search', 'toggle_favorite', 'preferences')
+FAVORITE_MIXES = ('none', 'five', 'all')
+
+
+def scaled_catalog(base, factor):
+    stride = max(base.by_id) if base.teams else 0
+    teams = [
+        team._replace(id=copy * stride + team.id, name=team.name if copy == 0 else f'{team.name} {copy}')
+        for copy in range(factor)
+        for team in base.teams
+    ]
+    return TeamCatalog(teams, f'{base.version}x{factor}')
+
+
+def cookie_mixes(catalog):
+    team_ids = [team.id for team in catalog.teams]
+    favorites = {'none': [], 'five': team_ids[:5], 'all': team_ids}
+    return [
+        {LANGUAGE_COOKIE: language, FAVORITES_COOKIE: encode_favorites(favorites[mix])}
+        for mix in FAVORITE_MIXES
+        for language, language_name in settings.LANGUAGES
+    ]
+
+
+def _request(client, view, cookies, team_id):
+    client.cookies.clear()
+    for name, value in cookies.items():
+        client.cookies[name] = value
+    if view == 'home':
+        return client.get('/')
+    if view == 'search':
+        return client.get('/teams/search/', {'search': 'bo'}, headers={'X-Requested-With': 'XMLHttpRequest'})
+    if view == 'toggle_favorite':
+        return client.post('/toggle-favorite/', json.dumps({'team_id': team_id}), content_type='application/json')
+    return client.get('/preferences/')
+
+
+def percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def measure(client, view, catalog, iterations, allocation_samples):
+    mixes = itertools.cycle(cookie_mixes(catalog))
+    team_ids = itertools.cycle(team.id for team in catalog.teams)
+
+    for _ in range(min(iterations, 12)):
+        _request(client, view, next(mixes), next(team_ids))
+
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        request_started = time.perf_counter()
+        response = _request(client, view, next(mixes), next(team_ids))
+        latencies.append(time.perf_counter() - request_started)
+        if response.status_code != 200:
+            raise CommandError(f'{view}: статус {response.status_code}')
+    elapsed = time.perf_counter() - started
+
+    peaks = []
+    tracemalloc.start()
+    try:
+        for _ in range(allocation_samples):
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            _request(client, view, next(mixes), next(team_ids))
+            peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+    finally:
+        tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'rps': iterations / elapsed,
+        'peak_alloc_kib': statistics.mean(peaks) / 1024 if peaks else 0.0,
+    }
+
+
+def find_regressions(results, baseline, threshold, metric='p95_ms'):
+    previous = {(row['view'], row['scale']): row for row in baseline.get('results', [])}
+    regressions = []
+    for row in results:
+        old = previous.get((row['view'], row['scale']))
+        if old and old[metric] > 0 and row[metric] > old[metric] * (1 + threshold):
+            regressions.append((row, old))
+    return regressions
+
+
+class Command(BaseCommand):
+    help = 'Измеряет задержку основных представлений на синтетических каталогах'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--views', default=','.join(VIEWS))
+        parser.add_argument('--scales', default='1,10,100,1000')
+        parser.add_argument('--iterations', type=int, default=200)
+        parser.add_argument('--allocation-samples', type=int, default=20)
+        parser.add_argument('--output', help='Путь для JSON с результатами')
+        parser.add_argument('--baseline', help='JSON с результатами предыдущего запуска')
+        parser.add_argument('--threshold', type=float, default=0.2, help='Допустимый рост p95, доля (0.2 = 20%%)')
+
+    def handle(self, *args, **options):
+        views = [view for view in options['views'].split(',') if view]
+        unknown = set(views) - set(VIEWS)
+        if unknown:
+            raise CommandError(f'Неизвестные представления: {", ".join(sorted(unknown))}')
+        scales = [int(scale) for scale in options['scales'].split(',') if scale]
+
+        # Замеряются сами представления: один синтетический клиент иначе упрётся в лимит записей.
+        settings_override = override_settings(ADMISSION_CONTROL_ENABLED=False)
+        settings_override.enable()
+        client = Client()
+        base = get_catalog()
+        results = []
+        self.stdout.write(f'{"view":<16}{"scale":>6}{"teams":>8}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}{"req/s":>9}{"KiB/req":>10}')
+        try:
+            for scale in scales:
+                catalog = scaled_catalog(base, scale)
+                set_catalog(catalog)
+                for view in views:
+                    row = {'view': view, 'scale': scale, 'teams': len(catalog)}
+                    row.update(measure(client, view, catalog, options['iterations'], options['allocation_samples']))
+                    results.append(row)
+                    self.stdout.write(
+                        f'{view:<16}{scale:>6}{row["teams"]:>8}{row["p50_ms"]:>9.2f}{row["p95_ms"]:>9.2f}'
+                        f'{row["p99_ms"]:>9.2f}{row["rps"]:>9.0f}{row["peak_alloc_kib"]:>10.1f}'
+                    )
+        finally:
+            set_catalog(base)
+            settings_override.disable()
+
+        overhead = measure_overhead()
+        self.stdout.write(f'metrics overhead: {overhead * 1e6:.2f} us/request')
+
+        report = {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'iterations': options['iterations'],
+            'metrics_overhead_us': overhead * 1e6,
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                json.dump(report, output, indent=2)
+
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as baseline_file:
+                baseline = json.load(baseline_file)
+            regressions = find_regressions(results, baseline, options['threshold'])
+            for row, old in regressions:
+                self.stderr.write(f'{row["view"]}@{row["scale"]}x: p95 {old["p95_ms"]:.2f} -> {row["p95_ms"]:.2f} ms')
+            if regressions:
+                raise CommandError(f'Регрессия p95 больше {options["threshold"]:.0%} в {len(regressions)} замерах')
@@ -0,0 +1,116 @@
+import statistics
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from django.utils.crypto import get_random_string
+
+from myapp.management.commands.bench_asgi import _wsgi_environ
+from myapp.preferences import FAVORITES_COOKIE, encode_favorites
+
+FLOOD_BODY = b'{"team_id": 5}'
+
+
+def _call(application, method, path, body, cookie):
+    statuses = []
+
+    def start_response(status, headers, exc_info=None):
+        statuses.append(int(status[:3]))
+
+    response = application(_wsgi_environ(method, path, body, cookie), start_response)
+    try:
+        b''.join(response)
+    finally:
+        response.close()
+    return statuses[0]
+
+
+def _reader(application, stop, latencies, statuses):
+    cookie = f'{settings.CSRF_COOKIE_NAME}={get_random_string(32)}; {FAVORITES_COOKIE}={encode_favorites([1, 2, 3])}'
+    while not stop.is_set():
+        started = time.perf_counter()
+        statuses[_call(application, 'GET', '/', b'', cookie)] += 1
+        latencies.append(time.perf_counter() - started)
+
+
+def _flooder(application, stop, statuses, interval):
+    # Клиент с зацикленными повторами и случайным cookie в каждом запросе, Retry-After игнорируется:
+    # без подписанного profile_id он всё равно узнаётся по адресу.
+    # Запросы идут по расписанию, а не «сразу после ответа», — быстрый отказ не ускоряет флуд.
+    scheduled = time.perf_counter()
+    while not stop.is_set():
+        cookie = f'{settings.CSRF_COOKIE_NAME}={get_random_string(32)}'
+        statuses[_call(application, 'POST', '/toggle-favorite/', FLOOD_BODY, cookie)] += 1
+        scheduled += interval
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        else:
+            statuses['missed'] += int(-delay // interval)
+            scheduled += -delay // interval * interval
+
+
+def run_load(application, readers, flooders, flood_rate, duration):
+    stop = threading.Event()
+    latencies = []
+    page_statuses = Counter()
+    write_statuses = Counter()
+    threads = [
+        threading.Thread(target=_reader, args=(application, stop, latencies, page_statuses)) for _ in range(readers)
+    ]
+    threads += [
+        threading.Thread(target=_flooder, args=(application, stop, write_statuses, flooders / flood_rate))
+        for _ in range(flooders)
+    ]
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return latencies, page_statuses, write_statuses
+
+
+class Command(BaseCommand):
+    help = 'Перегрузка записями от одного клиента: задержка главной страницы с контролем нагрузки и без'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=2, help='Потоков, открывающих главную')
+        parser.add_argument('--flooders', type=int, default=2, help='Потоков, заваливающих /toggle-favorite/')
+        parser.add_argument('--flood-rate', type=float, default=2000, help='Запросов флуда в секунду, всего')
+        parser.add_argument('--duration', type=float, default=5.0)
+
+    def handle(self, *args, **options):
+        if options['readers'] < 1:
+            raise CommandError('--readers: нужен хотя бы один поток')
+        with override_settings(ADMISSION_CONTROL_ENABLED=False):
+            unprotected = WSGIHandler()
+        protected = WSGIHandler()
+        scenarios = (
+            ('без нагрузки', protected, 0),
+            ('без контроля', unprotected, options['flooders']),
+            ('с контролем', protected, options['flooders']),
+        )
+
+        self.stdout.write(
+            f'{"сценарий":<14}{"home/s":>8}{"p50 ms":>8}{"p99 ms":>8}{"home 503":>9}'
+            f'{"flood/s":>9}{"200":>7}{"429":>8}{"503":>7}'
+        )
+        for name, application, flooders in scenarios:
+            latencies, pages, writes = run_load(
+                application, options['readers'], flooders, options['flood_rate'], options['duration']
+            )
+            if not latencies:
+                raise CommandError(f'{name}: главная не ответила ни разу')
+            latencies.sort()
+            p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+            self.stdout.write(
+                f'{name:<14}{len(latencies) / options["duration"]:>8.0f}'
+                f'{statistics.median(latencies) * 1000:>8.2f}{p99 * 1000:>8.2f}{pages[503]:>9}'
+                f'{(writes.total() - writes["missed"]) / options["duration"]:>9.0f}'
+                f'{writes[200]:>7}{writes[429]:>8}{writes[503]:>7}'
+            )
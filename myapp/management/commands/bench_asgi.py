@@ -0,0 +1,137 @@
+import asyncio
+import io
+import sys
+import time
+
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+COOKIE = 'django_language=ru; theme=dark; favorite_teams=1.AQEB'
+
+ENDPOINTS = (
+    ('team_search', 'GET', '/teams/search/?search=bo', b''),
+    ('toggle_favorite', 'POST', '/toggle-favorite/', b'{"team_id": 5}'),
+    ('change_theme', 'POST', '/change-theme/', b'{"theme": "dark"}'),
+    ('change_language', 'POST', '/change-language/', b'{"language": "ru"}'),
+    ('home', 'GET', '/', b''),
+)
+
+
+def _wsgi_environ(method, path, body, cookie=COOKIE):
+    path, _, query = path.partition('?')
+    return {
+        'REQUEST_METHOD': method,
+        'PATH_INFO': path,
+        'QUERY_STRING': query,
+        'SERVER_NAME': 'testserver',
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'REMOTE_ADDR': '127.0.0.1',
+        'HTTP_HOST': 'testserver',
+        'HTTP_COOKIE': cookie,
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.url_scheme': 'http',
+        'wsgi.version': (1, 0),
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+
+
+def _asgi_scope(method, path, body):
+    path, _, query = path.partition('?')
+    return {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': method,
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': query.encode(),
+        'root_path': '',
+        'headers': [
+            (b'host', b'testserver'),
+            (b'cookie', COOKIE.encode()),
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode()),
+        ],
+        'client': ('127.0.0.1', 0),
+        'server': ('testserver', 80),
+    }
+
+
+def run_wsgi(application, method, path, body, requests):
+    statuses = []
+
+    def start_response(status, headers, exc_info=None):
+        statuses.append(int(status[:3]))
+
+    started = time.perf_counter()
+    for _ in range(requests):
+        response = application(_wsgi_environ(method, path, body), start_response)
+        b''.join(response)
+        response.close()
+    return time.perf_counter() - started, statuses
+
+
+async def _asgi_request(application, method, path, body, statuses):
+    pending = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    disconnected = asyncio.Event()
+
+    async def receive():
+        if pending:
+            return pending.pop()
+        await disconnected.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            statuses.append(message['status'])
+
+    await application(_asgi_scope(method, path, body), receive, send)
+
+
+async def _run_asgi(application, method, path, body, requests, concurrency):
+    statuses = []
+    started = time.perf_counter()
+    for offset in range(0, requests, concurrency):
+        batch = min(concurrency, requests - offset)
+        await asyncio.gather(*(_asgi_request(application, method, path, body, statuses) for _ in range(batch)))
+    return time.perf_counter() - started, statuses
+
+
+def run_asgi(application, method, path, body, requests, concurrency):
+    return asyncio.run(_run_asgi(application, method, path, body, requests, concurrency))
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает пропускную способность JSON-эндпоинтов через ASGI и WSGI'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--concurrency', type=int, default=50)
+
+    def handle(self, *args, **options):
+        # Те же обработчики, что в myproject.asgi/wsgi, но без лимита записей для единственного клиента бенчмарка.
+        with override_settings(ADMISSION_CONTROL_ENABLED=False):
+            asgi_application = ASGIHandler()
+            wsgi_application = WSGIHandler()
+
+        requests = options['requests']
+        concurrency = options['concurrency']
+        self.stdout.write(f'{"endpoint":<18}{"WSGI req/s":>12}{"ASGI req/s":>12}{"ratio":>8}')
+        for name, method, path, body in ENDPOINTS:
+            run_wsgi(wsgi_application, method, path, body, min(requests, 50))
+            wsgi_elapsed, wsgi_statuses = run_wsgi(wsgi_application, method, path, body, requests)
+            asgi_elapsed, asgi_statuses = run_asgi(asgi_application, method, path, body, requests, concurrency)
+            if set(wsgi_statuses) != {200} or set(asgi_statuses) != {200}:
+                raise CommandError(f'{name}: неожиданные статусы {set(wsgi_statuses) | set(asgi_statuses)}')
+            wsgi_rate = requests / wsgi_elapsed
+            asgi_rate = requests / asgi_elapsed
+            self.stdout.write(f'{name:<18}{wsgi_rate:>12.0f}{asgi_rate:>12.0f}{asgi_rate / wsgi_rate:>8.2f}')
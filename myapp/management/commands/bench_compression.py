@@ -0,0 +1,84 @@
+import gzip
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+
+from myapp.compression import compressed_cache
+from myapp.management.commands.bench import scaled_catalog
+from myapp.models import get_catalog, set_catalog
+from myapp.preferences import FAVORITES_COOKIE, LANGUAGE_COOKIE, encode_favorites
+
+ENDPOINTS = (
+    ('home', '/', {}),
+    ('search', '/teams/search/', {'search': ''}),
+    ('search_stream', '/teams/search/', {'search': '', 'stream': '1'}),
+    ('team_detail', '/teams/1/', {}),
+)
+
+
+def _body(response):
+    return b''.join(response.streaming_content) if response.streaming else response.content
+
+
+def _run(client, path, params, headers, requests, clear_cache):
+    started = time.process_time()
+    for _ in range(requests):
+        if clear_cache:
+            compressed_cache.clear()
+        response = client.get(path, params, headers=headers)
+        body = _body(response)
+        if response.status_code != 200:
+            raise CommandError(f'{path}: статус {response.status_code}')
+    return (time.process_time() - started) / requests, response, body
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает размер и CPU динамических ответов без сжатия и с gzip на разных уровнях'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--levels', default='1,6,9', help='Уровни сжатия через запятую')
+        parser.add_argument('--scale', type=int, default=1, help='Во сколько раз размножить каталог')
+
+    def handle(self, *args, **options):
+        try:
+            levels = [int(level) for level in options['levels'].split(',')]
+        except ValueError:
+            raise CommandError('--levels: ожидаются целые числа через запятую')
+        if any(not 1 <= level <= 9 for level in levels):
+            raise CommandError('--levels: уровни от 1 до 9')
+
+        base = get_catalog()
+        if options['scale'] > 1:
+            set_catalog(scaled_catalog(base, options['scale']))
+        client = Client()
+        client.cookies[LANGUAGE_COOKIE] = 'ru'
+        client.cookies[FAVORITES_COOKIE] = encode_favorites([team.id for team in get_catalog().teams[:5]])
+        requests = options['requests']
+
+        self.stdout.write(
+            f'{"endpoint":<15}{"level":>6}{"bytes":>9}{"gzip":>8}{"ratio":>7}'
+            f'{"CPU ms":>9}{"+gzip":>8}{"+cached":>9}'
+        )
+        try:
+            for name, path, params in ENDPOINTS:
+                plain_cpu, _, plain_body = _run(client, path, params, {}, requests, False)
+                for level in levels:
+                    with override_settings(COMPRESSION_LEVEL=level):
+                        headers = {'Accept-Encoding': 'gzip'}
+                        cold_cpu, response, body = _run(client, path, params, headers, requests, True)
+                        cached_cpu, response, body = _run(client, path, params, headers, requests, False)
+                    compressed = len(body)
+                    if response.get('Content-Encoding') == 'gzip':
+                        body = gzip.decompress(body)
+                    # В HTML каждый раз новый CSRF-токен, поэтому побайтно сравниваются только JSON-ответы.
+                    if name != 'home' and body != plain_body:
+                        raise CommandError(f'{name}: после распаковки тело не совпадает с несжатым')
+                    self.stdout.write(
+                        f'{name:<15}{level:>6}{len(plain_body):>9}{compressed:>8}'
+                        f'{len(plain_body) / compressed:>7.1f}{plain_cpu * 1000:>9.3f}'
+                        f'{(cold_cpu - plain_cpu) * 1000:>+8.3f}{(cached_cpu - plain_cpu) * 1000:>+9.3f}'
+                    )
+        finally:
+            set_catalog(base)
@@ -0,0 +1,160 @@
+import asyncio
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp.events import hub
+from myapp.preferences import FAVORITES_COOKIE, encode_favorites
+
+# Треть подписчиков слушает всё, треть — избранное из cookie, треть — одну команду.
+SUBSCRIPTIONS = (
+    ('', ''),
+    ('teams=favorites', f'{FAVORITES_COOKIE}={encode_favorites([1, 2, 3])}'),
+    ('teams=4', ''),
+)
+
+
+def _rss_bytes():
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * 4096
+    except OSError:
+        return None
+
+
+def _events_scope(query, cookie):
+    return {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': '/events/',
+        'raw_path': b'/events/',
+        'query_string': query.encode(),
+        'root_path': '',
+        'headers': [(b'host', b'testserver'), (b'accept', b'text/event-stream'), (b'cookie', cookie.encode())],
+        'client': ('127.0.0.1', 0),
+        'server': ('testserver', 80),
+    }
+
+
+class _Counter:
+    def __init__(self):
+        self.events = 0
+        self.statuses = []
+        self.target = None
+        self.reached = asyncio.Event()
+
+    def add(self, chunk):
+        self.events += chunk.count(b'\nevent: ')
+        if self.target is not None and self.events >= self.target:
+            self.reached.set()
+
+    def expect(self, count):
+        self.target = self.events + count
+        self.reached.clear()
+        if count == 0:
+            self.reached.set()
+
+
+async def _connection(application, query, cookie, counter, closed):
+    pending = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+
+    async def receive():
+        if pending:
+            return pending.pop()
+        await closed.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            counter.statuses.append(message['status'])
+        elif message['type'] == 'http.response.body' and message.get('body'):
+            counter.add(message['body'])
+
+    await application(_events_scope(query, cookie), receive, send)
+
+
+async def _run(application, connections, events, burst):
+    counter = _Counter()
+    closed = asyncio.Event()
+    base_subscribers = len(hub)
+    rss_before = _rss_bytes()
+
+    started = time.perf_counter()
+    tasks = [
+        asyncio.create_task(_connection(application, *SUBSCRIPTIONS[index % len(SUBSCRIPTIONS)], counter, closed))
+        for index in range(connections)
+    ]
+    while len(hub) - base_subscribers < connections:
+        if any(task.done() for task in tasks):
+            raise CommandError(f'Подключение завершилось раньше времени, статусы: {set(counter.statuses)}')
+        await asyncio.sleep(0.01)
+    connect_time = time.perf_counter() - started
+    rss_after = _rss_bytes()
+
+    latencies = []
+    deliveries = 0
+    for number in range(events):
+        published = time.perf_counter()
+        delivered = hub.publish('score', {'score': number}, team_id=number % 10 + 1)
+        counter.expect(delivered)
+        await counter.reached.wait()
+        latencies.append(time.perf_counter() - published)
+        deliveries += delivered
+
+    dropped_before = hub.dropped
+    delivered_before = counter.events
+    for number in range(burst):
+        hub.publish('news', {'message': number})
+    await asyncio.sleep(0.5)
+    burst_delivered = counter.events - delivered_before
+    burst_dropped = hub.dropped - dropped_before
+
+    closed.set()
+    await asyncio.gather(*tasks)
+    return {
+        'connect_time': connect_time,
+        'rss_per_connection': (rss_after - rss_before) / connections if rss_before is not None else None,
+        'latencies': latencies,
+        'deliveries': deliveries,
+        'burst_delivered': burst_delivered,
+        'burst_dropped': burst_dropped,
+    }
+
+
+class Command(BaseCommand):
+    help = 'Нагрузочный тест SSE: сколько подключений держит один ASGI-воркер'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--connections', default='100,1000,5000', help='Число подключений через запятую')
+        parser.add_argument('--events', type=int, default=200)
+        parser.add_argument('--burst', type=int, default=100, help='Событий подряд без ожидания, проверка backpressure')
+
+    def handle(self, *args, **options):
+        from myproject.asgi import application
+
+        try:
+            scales = [int(value) for value in options['connections'].split(',')]
+        except ValueError:
+            raise CommandError('--connections: ожидаются целые числа через запятую')
+
+        self.stdout.write(
+            f'{"conns":>7}{"connect s":>11}{"KiB/conn":>10}{"p50 ms":>9}{"p99 ms":>9}'
+            f'{"deliv/s":>11}{"burst ok":>10}{"dropped":>9}'
+        )
+        for connections in scales:
+            result = asyncio.run(_run(application, connections, options['events'], options['burst']))
+            latencies = sorted(result['latencies'])
+            p50 = statistics.median(latencies)
+            p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+            rss = result['rss_per_connection']
+            self.stdout.write(
+                f'{connections:>7}{result["connect_time"]:>11.2f}'
+                f'{(f"{rss / 1024:.1f}" if rss is not None else "n/a"):>10}'
+                f'{p50 * 1000:>9.2f}{p99 * 1000:>9.2f}'
+                f'{result["deliveries"] / sum(latencies):>11.0f}'
+                f'{result["burst_delivered"]:>10}{result["burst_dropped"]:>9}'
+            )
@@ -0,0 +1,137 @@
+import random
+import statistics
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp.models import get_catalog
+from myapp.preferences import decode_favorites, encode_favorites
+from myapp.profiles import UPSERT, ProfileStore, connect, new_profile_id
+
+
+def _percentiles(latencies):
+    latencies = sorted(latencies)
+    return statistics.median(latencies), latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+
+
+def _toggle_worker(store, profile_ids, team_ids, count, seed):
+    rng = random.Random(seed)
+    for _ in range(count):
+        team_id = rng.choice(team_ids)
+        # team_id привязывается сразу: хранилище применяет изменение ещё раз при записи в базу.
+        store.update(rng.choice(profile_ids), lambda favorites, team_id=team_id: favorites ^ {team_id})
+
+
+def _write_through(path, profile_ids, team_ids, count, seed):
+    # Для сравнения: каждое переключение — отдельное чтение и отдельная транзакция.
+    rng = random.Random(seed)
+    connection = connect(path)
+    started = time.perf_counter()
+    for _ in range(count):
+        profile_id = rng.choice(profile_ids)
+        row = connection.execute('SELECT favorites FROM profiles WHERE id = ?', (profile_id,)).fetchone()
+        favorites = decode_favorites(row[0]) if row else frozenset()
+        connection.execute(UPSERT, (profile_id, encode_favorites(favorites ^ {rng.choice(team_ids)}), time.time()))
+    elapsed = time.perf_counter() - started
+    connection.close()
+    return count / elapsed
+
+
+def _read_latencies(store, profile_ids, count, seed):
+    rng = random.Random(seed)
+    latencies = []
+    for _ in range(count):
+        profile_id = rng.choice(profile_ids)
+        started = time.perf_counter()
+        store.get(profile_id)
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+class Command(BaseCommand):
+    help = 'Бенчмарк серверного хранилища избранного: переключения в секунду и задержка чтения'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100000)
+        parser.add_argument('--toggles', type=int, default=200000)
+        parser.add_argument('--threads', type=int, default=4)
+        parser.add_argument('--reads', type=int, default=20000)
+        parser.add_argument('--cache-size', type=int, default=settings.PROFILE_CACHE_SIZE)
+        parser.add_argument('--flush-interval', type=float, default=settings.PROFILE_FLUSH_INTERVAL)
+        parser.add_argument('--write-through', type=int, default=2000, help='Переключений в режиме без очереди')
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['threads'] < 1:
+            raise CommandError('--users и --threads должны быть положительными')
+        rng = random.Random(0)
+        team_ids = [team.id for team in get_catalog().teams]
+        profile_ids = [new_profile_id() for _ in range(options['users'])]
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / 'profiles.sqlite3'
+            store = ProfileStore(path, options['cache_size'], options['flush_interval'])
+            try:
+                started = time.perf_counter()
+                for profile_id in profile_ids:
+                    store.set(profile_id, rng.sample(team_ids, rng.randint(0, 5)))
+                store.flush()
+                seed_time = time.perf_counter() - started
+                self.stdout.write(f'профилей {len(profile_ids):,}: {len(profile_ids) / seed_time:,.0f} записей/с')
+
+                writes = store.writes
+                flushed = store.flushed
+                transactions = store.transactions
+                per_thread = options['toggles'] // options['threads']
+                threads = [
+                    threading.Thread(target=_toggle_worker, args=(store, profile_ids, team_ids, per_thread, index))
+                    for index in range(options['threads'])
+                ]
+                started = time.perf_counter()
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+                queued_time = time.perf_counter() - started
+                store.flush()
+                durable_time = time.perf_counter() - started
+                toggles = store.writes - writes
+                rows = store.flushed - flushed
+                batches = store.transactions - transactions
+                self.stdout.write(
+                    f'переключения, потоков {options["threads"]}: {toggles / queued_time:,.0f}/с в очередь, '
+                    f'{toggles / durable_time:,.0f}/с с записью на диск'
+                )
+                self.stdout.write(
+                    f'  транзакций {batches}, в среднем {rows / max(batches, 1):,.0f} строк, '
+                    f'схлопнуто повторных записей {toggles - rows:,}'
+                )
+                self._check(path, store, rng.sample(profile_ids, min(1000, len(profile_ids))))
+
+                rate = _write_through(path, profile_ids, team_ids, options['write_through'], 1)
+                self.stdout.write(f'без очереди (транзакция на переключение): {rate:,.0f}/с')
+
+                _read_latencies(store, profile_ids[:options['cache_size']], options['reads'], 2)
+                hot = _read_latencies(store, profile_ids[:options['cache_size']], options['reads'], 3)
+                store.cache.clear()
+                cold = _read_latencies(store, profile_ids, options['reads'], 4)
+                for name, latencies in (('чтение из LRU', hot), ('чтение из SQLite', cold)):
+                    p50, p99 = _percentiles(latencies)
+                    self.stdout.write(f'{name:<18} p50 {p50 * 1e6:>7.1f} мкс  p99 {p99 * 1e6:>7.1f} мкс')
+            finally:
+                store.close()
+
+    def _check(self, path, store, profile_ids):
+        expected = {profile_id: store.get(profile_id) for profile_id in profile_ids}
+        store.flush()
+        connection = connect(path)
+        try:
+            for profile_id in profile_ids:
+                row = connection.execute('SELECT favorites FROM profiles WHERE id = ?', (profile_id,)).fetchone()
+                if row is None or decode_favorites(row[0]) != expected[profile_id]:
+                    raise CommandError(f'Профиль {profile_id}: на диске не то, что вернуло хранилище')
+        finally:
+            connection.close()
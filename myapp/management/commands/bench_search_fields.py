@@ -0,0 +1,64 @@
+import gzip
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+from myapp.fragments import SEARCH_FIELDS, search_cache, serialize_team_search, serializer_cache
+from myapp.management.commands.bench import scaled_catalog
+from myapp.models import get_catalog, set_catalog
+
+# Поля, которые рисует updateTeamsDisplay в main.js.
+CARD_FIELDS = ('id', 'name', 'city', 'conference', 'division', 'colors')
+VARIANTS = (
+    ('все поля', SEARCH_FIELDS, False),
+    ('поля карточки', CARD_FIELDS, False),
+    ('карточка, compact', CARD_FIELDS, True),
+)
+
+
+def _serialize_time(catalog, fields, compact, repeat, clear_serializers):
+    # Кеш тел поиска сбрасывается каждый раз, иначе измерялся бы только его поиск по ключу.
+    started = time.perf_counter()
+    for _ in range(repeat):
+        search_cache.clear()
+        if clear_serializers:
+            serializer_cache.clear()
+        serialize_team_search(catalog, '', 0, len(catalog.teams), fields, compact)
+    return (time.perf_counter() - started) / repeat
+
+
+class Command(BaseCommand):
+    help = 'Размер ответа поиска и время его сборки для разных ?fields= и ?format='
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=200)
+        parser.add_argument('--scale', type=int, default=10, help='Во сколько раз размножить каталог')
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat: нужно хотя бы одно повторение')
+        base = get_catalog()
+        if options['scale'] > 1:
+            set_catalog(scaled_catalog(base, options['scale']))
+        client = Client()
+        try:
+            catalog = get_catalog()
+            self.stdout.write(f'команд: {len(catalog.teams)}')
+            self.stdout.write(f'{"вариант":<20}{"bytes":>9}{"gzip":>8}{"сборка мкс":>12}{"готовый сериализатор":>22}')
+            for name, fields, compact in VARIANTS:
+                params = {'search': '', 'limit': len(catalog.teams), 'fields': ','.join(fields)}
+                if compact:
+                    params['format'] = 'compact'
+                response = client.get('/teams/search/', params)
+                if response.status_code != 200:
+                    raise CommandError(f'{name}: статус {response.status_code}')
+                body = response.content
+                cold = _serialize_time(catalog, fields, compact, options['repeat'], True)
+                warm = _serialize_time(catalog, fields, compact, options['repeat'], False)
+                self.stdout.write(
+                    f'{name:<20}{len(body):>9}{len(gzip.compress(body)):>8}'
+                    f'{cold * 1e6:>12.1f}{warm * 1e6:>22.1f}'
+                )
+        finally:
+            set_catalog(base)
@@ -0,0 +1,123 @@
+import math
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp.management.commands.bench import scaled_catalog
+from myapp.models import get_catalog
+from myapp.standings import GAMES_HEADER, SEASON_START_MONTH, StandingsEngine
+
+SEASON_START = (10, 22)
+
+
+def generate_games(team_ids, seasons, games_per_team, first_season, seed=0):
+    rng = np.random.default_rng(seed)
+    team_ids = np.asarray(team_ids)
+    lines = []
+    for season in range(first_season, first_season + seasons):
+        day = date(season, *SEASON_START)
+        for _ in range(games_per_team):
+            pairs = rng.permutation(team_ids)[:len(team_ids) // 2 * 2].reshape(-1, 2)
+            scores = rng.integers(85, 135, size=pairs.shape)
+            scores[:, 0] += scores[:, 0] == scores[:, 1]
+            lines.extend(
+                f'{day.isoformat()},{home},{away},{home_score},{away_score}'
+                for (home, away), (home_score, away_score) in zip(pairs.tolist(), scores.tolist())
+            )
+            day += timedelta(days=1)
+    return lines
+
+
+def python_standings(lines):
+    # Построчный подсчёт без NumPy — и эталон для проверки, и база для сравнения скорости.
+    tables = {}
+    for line in lines:
+        day, home, away, home_score, away_score = line.split(',')
+        season = int(day[:4]) - (int(day[5:7]) < SEASON_START_MONTH)
+        winner, loser = (int(home), int(away)) if int(home_score) > int(away_score) else (int(away), int(home))
+        table = tables.setdefault(season, {'wins': {}, 'losses': {}, 'head_to_head': {}})
+        table['wins'][winner] = table['wins'].get(winner, 0) + 1
+        table['losses'][loser] = table['losses'].get(loser, 0) + 1
+        table['head_to_head'][winner, loser] = table['head_to_head'].get((winner, loser), 0) + 1
+    return tables
+
+
+def _timed(function, *args):
+    started = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - started, result
+
+
+class Command(BaseCommand):
+    help = 'Бенчмарк турнирной таблицы на многосезонном журнале игр'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--teams', type=int, default=30)
+        parser.add_argument('--seasons', type=int, default=10)
+        parser.add_argument('--games-per-team', type=int, default=82)
+        parser.add_argument('--appends', type=int, default=50, help='Сколько игровых дней дописать после загрузки')
+        parser.add_argument('--first-season', type=int, default=2015)
+        parser.add_argument('--output', help='Сохранить сгенерированный журнал игр в файл')
+
+    def handle(self, *args, **options):
+        if options['teams'] < 2:
+            raise CommandError('--teams: нужно хотя бы две команды')
+        base = get_catalog()
+        catalog = scaled_catalog(base, math.ceil(options['teams'] / len(base)))
+        team_ids = [team.id for team in catalog.teams[:options['teams']]]
+
+        lines = generate_games(team_ids, options['seasons'], options['games_per_team'], options['first_season'])
+        last_season = options['first_season'] + options['seasons'] - 1
+        appended = generate_games(team_ids, 1, options['appends'], last_season + 1, seed=1)
+        games_per_day = len(team_ids) // 2
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(options['output'] or Path(directory) / 'games.csv')
+            path.write_text(GAMES_HEADER + '\n' + '\n'.join(lines) + '\n')
+
+            engine = StandingsEngine(path)
+            load_time, _ = _timed(engine.refresh)
+
+            append_times = []
+            for offset in range(0, len(appended), games_per_day):
+                with path.open('a') as handle:
+                    handle.write('\n'.join(appended[offset:offset + games_per_day]) + '\n')
+                elapsed, _ = _timed(engine.refresh)
+                append_times.append(elapsed)
+
+            rank_times = []
+            for _ in range(20):
+                engine._cache.clear()
+                elapsed, _ = _timed(engine.standings, catalog, last_season, 'conference')
+                rank_times.append(elapsed)
+            engine.standings(catalog, last_season, 'conference')
+            cached_time, _ = _timed(engine.standings, catalog, last_season, 'conference')
+
+            python_time, reference = _timed(python_standings, lines + appended)
+
+        self._check(engine, reference)
+        games = engine.games
+        self.stdout.write(f'журнал: {games} игр, {len(engine.seasons)} сезонов, {len(team_ids)} команд')
+        self.stdout.write(f'полная загрузка NumPy      {load_time * 1000:>10.1f} мс  ({games / load_time:,.0f} игр/с)')
+        self.stdout.write(f'построчно на Python        {python_time * 1000:>10.1f} мс  ({games / python_time:,.0f} игр/с)')
+        self.stdout.write(
+            f'дописать игровой день      {statistics.median(append_times) * 1000:>10.2f} мс  '
+            f'(медиана по {len(append_times)}, {games_per_day} игр)'
+        )
+        self.stdout.write(f'таблица конференций        {statistics.median(rank_times) * 1000:>10.2f} мс')
+        self.stdout.write(f'таблица из кеша            {cached_time * 1000:>10.3f} мс')
+
+    def _check(self, engine, reference):
+        for season, expected in reference.items():
+            table = engine.seasons[season]
+            for team_id, wins in expected['wins'].items():
+                if table.wins[team_id] != wins:
+                    raise CommandError(f'Сезон {season}: расходятся победы команды {team_id}')
+            for (winner, loser), count in expected['head_to_head'].items():
+                if table.head_to_head[winner, loser] != count:
+                    raise CommandError(f'Сезон {season}: расходятся личные встречи {winner}-{loser}')
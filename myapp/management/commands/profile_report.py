@@ -0,0 +1,35 @@
+import io
+import pstats
+
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp.profiling import make_token, profile_dir
+
+
+class Command(BaseCommand):
+    help = 'Объединяет сохранённые профили запросов в общий отчёт'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--view', help='Учитывать только профили указанного представления')
+        parser.add_argument('--sort', default='cumulative', choices=('cumulative', 'tottime', 'calls'))
+        parser.add_argument('--limit', type=int, default=30)
+        parser.add_argument('--output', help='Сохранить объединённый профиль в файл pstats')
+        parser.add_argument('--token', action='store_true', help='Вывести подписанное значение заголовка профилирования')
+
+    def handle(self, *args, **options):
+        if options['token']:
+            self.stdout.write(make_token())
+            return
+
+        pattern = f'*-{options["view"]}.prof' if options['view'] else '*.prof'
+        files = sorted(str(path) for path in profile_dir().glob(pattern))
+        if not files:
+            raise CommandError(f'Нет профилей в {profile_dir()}')
+
+        report = io.StringIO()
+        stats = pstats.Stats(*files, stream=report)
+        if options['output']:
+            stats.dump_stats(options['output'])
+        stats.strip_dirs().sort_stats(options['sort']).print_stats(options['limit'])
+        self.stdout.write(f'Объединено профилей: {len(files)}')
+        self.stdout.write(report.getvalue())
@@ -0,0 +1,55 @@
+import json
+import socket
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp.events import parse_event, socket_paths
+
+
+class Command(BaseCommand):
+    help = 'Публикует событие для SSE-подписчиков всех запущенных ASGI-воркеров'
+
+    def add_arguments(self, parser):
+        parser.add_argument('event', nargs='?', help='Тип события: score, standings или news')
+        parser.add_argument('--team', type=int, help='ID команды; без него событие получат все подписчики')
+        parser.add_argument('--data', default='{}', help='JSON-объект с данными события')
+        parser.add_argument('--stdin', action='store_true', help='Читать события построчно из stdin в формате JSON Lines')
+
+    def handle(self, *args, **options):
+        if options['stdin']:
+            lines = (line for line in sys.stdin if line.strip())
+        elif options['event']:
+            try:
+                data = json.loads(options['data'])
+            except json.JSONDecodeError as e:
+                raise CommandError(f'Неверный JSON в --data: {e}')
+            lines = [json.dumps({'event': options['event'], 'team_id': options['team'], 'data': data})]
+        else:
+            raise CommandError('Укажите тип события или --stdin')
+
+        payload = bytearray()
+        count = 0
+        for number, line in enumerate(lines, start=1):
+            try:
+                parse_event(json.loads(line))
+            except ValueError as e:
+                raise CommandError(f'Событие {number}: {e}')
+            payload += line.strip().encode() + b'\n'
+            count += 1
+
+        workers = 0
+        for path in socket_paths():
+            try:
+                with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+                    connection.connect(str(path))
+                    connection.sendall(payload)
+            except (ConnectionRefusedError, FileNotFoundError):
+                # Воркер завершился, не убрав за собой сокет.
+                path.unlink(missing_ok=True)
+                continue
+            workers += 1
+
+        if not workers:
+            raise CommandError('Нет запущенных воркеров с подписчиками')
+        self.stdout.write(f'Отправлено событий: {count}, воркеров: {workers}')
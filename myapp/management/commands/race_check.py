@@ -0,0 +1,249 @@
+import json
+import multiprocessing
+import random
+import re
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from http.cookies import SimpleCookie
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from myapp.management.commands.bench_asgi import _wsgi_environ
+from myapp.models import THEME_CHOICES, get_catalog
+from myapp.preferences import (
+    FAVORITES_COOKIE, LANGUAGE_COOKIE, PROFILE_COOKIE, THEME_COOKIE, decode_favorites, encode_favorites,
+)
+from myapp.profiles import get_profile_store, unsign_profile_id
+
+SEARCH_TERMS = ('', 'bo', 'la', 'new', 'san', 'x')
+# Строка, по которой видно, какой язык был активен при рендеринге, а не только что записано в контекст.
+HOME_TITLES = {'en': '<title>Home', 'ru': '<title>Главная'}
+CONFERENCE_LABELS = {'en': 'Conference', 'ru': 'Конференция'}
+CARD_PATTERN = re.compile(r'class="team-card" data-team-id="(\d+)" data-is-favorite="(true|false)"')
+HTML_PATTERN = re.compile(r'<html lang="([^"]*)" data-theme="([^"]*)"')
+MAX_ERRORS = 20
+
+_application = None
+
+
+def _random_state(rng, team_ids):
+    language = rng.choice((None, 'en', 'ru'))
+    theme = rng.choice((None, *(code for code, name in THEME_CHOICES)))
+    favorites = frozenset(rng.sample(team_ids, rng.randint(0, min(5, len(team_ids)))))
+    cookies = []
+    if language:
+        cookies.append(f'{LANGUAGE_COOKIE}={language}')
+    if theme:
+        cookies.append(f'{THEME_COOKIE}={theme}')
+    if favorites:
+        # Часть клиентов ещё присылает избранное в старом JSON-формате.
+        value = encode_favorites(favorites) if rng.random() < 0.8 else json.dumps(sorted(favorites)).replace(' ', '')
+        cookies.append(f'{FAVORITES_COOKIE}={value}')
+    state = {
+        'language': language or settings.LANGUAGE_CODE,
+        'theme': theme or 'light',
+        'favorites': favorites,
+    }
+    return state, '; '.join(cookies)
+
+
+def _call(application, method, path, body, cookie):
+    response_status = []
+    response_headers = []
+
+    def start_response(status, headers, exc_info=None):
+        response_status.append(int(status[:3]))
+        response_headers.extend(headers)
+
+    response = application(_wsgi_environ(method, path, body, cookie), start_response)
+    try:
+        content = b''.join(response)
+    finally:
+        response.close()
+    return response_status[0], response_headers, content
+
+
+def _check_home(application, rng, catalog, state, cookie):
+    term = rng.choice(SEARCH_TERMS)
+    status, headers, content = _call(application, 'GET', f'/?search={term}', b'', cookie)
+    if status != 200:
+        return f'GET /: статус {status}'
+    html = content.decode()
+    match = HTML_PATTERN.search(html)
+    if match is None or match.groups() != (state['language'], state['theme']):
+        return f'GET /: ожидались lang/theme {state["language"]}/{state["theme"]}, получено {match and match.groups()}'
+    if HOME_TITLES[state['language']] not in html:
+        return f'GET /: заголовок не на языке {state["language"]}'
+    cards = {int(team_id): flag == 'true' for team_id, flag in CARD_PATTERN.findall(html)}
+    expected = {team.id: team.id in state['favorites'] for team in catalog.search(term)}
+    if cards != expected:
+        return f'GET /?search={term}: карточки или флаги избранного не совпадают'
+    return None
+
+
+def _check_search(application, rng, catalog, state, cookie):
+    term = rng.choice(SEARCH_TERMS)
+    status, headers, content = _call(application, 'GET', f'/teams/search/?search={term}', b'', cookie)
+    if status != 200:
+        return f'GET /teams/search/: статус {status}'
+    data = json.loads(content)
+    team_ids = [team['id'] for team in data['teams']]
+    if team_ids != [team.id for team in catalog.search(term)]:
+        return f'GET /teams/search/?search={term}: неверный список команд'
+    if set(data['favorites']) != state['favorites'].intersection(team_ids):
+        return f'GET /teams/search/?search={term}: favorites {data["favorites"]}, ожидалось {sorted(state["favorites"])}'
+    return None
+
+
+def _check_preferences(application, rng, catalog, state, cookie):
+    status, headers, content = _call(application, 'GET', '/preferences/', b'', cookie)
+    if status != 200:
+        return f'GET /preferences/: статус {status}'
+    match = HTML_PATTERN.search(content.decode())
+    if match is None or match.groups() != (state['language'], state['theme']):
+        return f'GET /preferences/: ожидались lang/theme {state["language"]}/{state["theme"]}'
+    return None
+
+
+def _check_detail(application, rng, catalog, state, cookie):
+    team = rng.choice(catalog.teams)
+    status, headers, content = _call(application, 'GET', f'/teams/{team.id}/', b'', cookie)
+    if status != 200:
+        return f'GET /teams/{team.id}/: статус {status}'
+    label = json.loads(content)['conference_label']
+    if CONFERENCE_LABELS[state['language']] not in label:
+        return f'GET /teams/{team.id}/: подпись {label!r} не на языке {state["language"]}'
+    return None
+
+
+def _check_toggle(application, rng, catalog, state, cookie):
+    team = rng.choice(catalog.teams)
+    body = json.dumps({'team_id': team.id}).encode()
+    status, headers, content = _call(application, 'POST', '/toggle-favorite/', body, cookie)
+    if status != 200:
+        return f'POST /toggle-favorite/: статус {status}'
+    data = json.loads(content)
+    expected = state['favorites'] ^ {team.id}
+    if data['is_favorite'] != (team.id in expected) or data['favorite_count'] != len(expected):
+        return f'POST /toggle-favorite/ {team.id}: ответ {data}, ожидалось избранное {sorted(expected)}'
+    cookies = SimpleCookie()
+    for name, value in headers:
+        if name.lower() == 'set-cookie':
+            cookies.load(value)
+    if PROFILE_COOKIE in cookies:
+        saved = get_profile_store().get(unsign_profile_id(cookies[PROFILE_COOKIE].value))
+    else:
+        saved = decode_favorites(cookies[FAVORITES_COOKIE].value) if FAVORITES_COOKIE in cookies else None
+    if saved != expected:
+        return f'POST /toggle-favorite/ {team.id}: сохранённое избранное не совпадает с ответом'
+    return None
+
+
+CHECKS = (_check_home, _check_search, _check_preferences, _check_detail, _check_toggle)
+
+
+def _get_application():
+    global _application
+    if _application is None:
+        # Все запросы идут от одного адреса: контроль нагрузки отклонял бы их, а проверка перестала бы что-то проверять.
+        with override_settings(ADMISSION_CONTROL_ENABLED=False):
+            _application = WSGIHandler()
+    return _application
+
+
+def _worker(seed, requests):
+    application = _get_application()
+    rng = random.Random(seed)
+    catalog = get_catalog()
+    team_ids = [team.id for team in catalog.teams]
+    errors = []
+    started = time.perf_counter()
+    for _ in range(requests):
+        state, cookie = _random_state(rng, team_ids)
+        error = rng.choice(CHECKS)(application, rng, catalog, state, cookie)
+        if error and len(errors) < MAX_ERRORS:
+            errors.append(f'{error} (cookie: {cookie or "нет"})')
+    return requests, started, time.perf_counter(), errors
+
+
+def _thread_pool(threads, requests, seed):
+    # Потоки стартуют одновременно, чтобы запросы с разными cookie действительно перемежались.
+    barrier = threading.Barrier(threads)
+
+    def run(index):
+        barrier.wait()
+        return _worker(seed + index, requests)
+
+    with ThreadPoolExecutor(threads) as executor:
+        return list(executor.map(run, range(threads)))
+
+
+def _process_pool(processes, threads, requests, seed):
+    # fork: дочерние процессы наследуют настроенный Django и загруженный каталог.
+    context = multiprocessing.get_context('fork')
+    with ProcessPoolExecutor(processes, mp_context=context) as executor:
+        futures = [
+            executor.submit(_thread_pool, threads, requests, seed + index * threads)
+            for index in range(processes)
+        ]
+        return [result for future in futures for result in future.result()]
+
+
+def _parse_counts(value, option):
+    try:
+        counts = [int(count) for count in value.split(',')]
+    except ValueError:
+        raise CommandError(f'{option}: ожидаются целые числа через запятую')
+    if any(count < 1 for count in counts):
+        raise CommandError(f'{option}: значения должны быть положительными')
+    return counts
+
+
+class Command(BaseCommand):
+    help = 'Гоняет WSGI-приложение из потоков и процессов со случайными cookie и проверяет каждый ответ'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', default='1,2,4,8', help='Число потоков через запятую')
+        parser.add_argument('--processes', default='1,2,4', help='Число процессов через запятую')
+        parser.add_argument('--requests', type=int, default=500, help='Запросов на поток')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        thread_counts = _parse_counts(options['threads'], '--threads')
+        process_counts = _parse_counts(options['processes'], '--processes')
+        requests = options['requests']
+        seed = options['seed']
+
+        # Прогрев в главном процессе: кеши фрагментов и таблица попадут в fork уже заполненными.
+        _worker(seed, min(requests, 50))
+
+        runs = [('threads', count, lambda count=count: _thread_pool(count, requests, seed)) for count in thread_counts]
+        runs += [
+            ('processes', count, lambda count=count: _process_pool(count, 1, requests, seed))
+            for count in process_counts
+        ]
+
+        self.stdout.write(f'{"mode":<11}{"workers":>8}{"requests":>10}{"req/s":>10}{"speedup":>9}{"errors":>8}')
+        baseline = {}
+        errors = []
+        for mode, count, run in runs:
+            results = run()
+            total = sum(result[0] for result in results)
+            elapsed = max(result[2] for result in results) - min(result[1] for result in results)
+            rate = total / elapsed
+            run_errors = [error for result in results for error in result[3]]
+            baseline.setdefault(mode, rate / count)
+            self.stdout.write(
+                f'{mode:<11}{count:>8}{total:>10}{rate:>10.0f}{rate / baseline[mode]:>9.2f}{len(run_errors):>8}'
+            )
+            errors.extend(f'{mode}={count}: {error}' for error in run_errors)
+
+        if errors:
+            for error in errors[:MAX_ERRORS]:
+                self.stderr.write(error)
+            raise CommandError(f'Найдено несогласованных ответов: {len(errors)}')
+        self.stdout.write(self.style.SUCCESS('Все ответы согласованы с cookie запроса'))
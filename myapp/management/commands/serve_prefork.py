@@ -0,0 +1,245 @@
+import gc
+import os
+import signal
+import socket
+import time
+import traceback
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.servers.basehttp import WSGIRequestHandler, WSGIServer
+from django.core.wsgi import get_wsgi_application
+from django.db import connections
+
+from myapp.loader import get_watcher, reload_catalog, watch_catalog_on_startup
+from myapp.profiles import close_profile_store
+from myapp.standings import get_engine
+from myapp.warmup import run_warmup
+
+MASTER_SIGNALS = (signal.SIGHUP, signal.SIGTERM, signal.SIGINT, signal.SIGCHLD, signal.SIGUSR1)
+MEMORY_FIELDS = ('Rss', 'Pss', 'Shared_Clean', 'Shared_Dirty', 'Private_Clean', 'Private_Dirty')
+# Сколько ждать, пока старые воркеры допишут начатые ответы.
+GRACEFUL_TIMEOUT = 30
+POLL_INTERVAL = 0.5
+
+
+def memory_usage(pid):
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as rollup:
+            lines = rollup.readlines()
+    except OSError:
+        return None
+    usage = {}
+    for line in lines:
+        name, _, value = line.partition(':')
+        if name in MEMORY_FIELDS:
+            usage[name] = int(value.split()[0]) * 1024
+    return usage
+
+
+def _parse_bind(value):
+    host, _, port = value.rpartition(':')
+    try:
+        return host.strip('[]') or '127.0.0.1', int(port)
+    except ValueError:
+        raise CommandError(f'--bind: ожидается host:port, получено {value!r}')
+
+
+def _serve(listener, application, quiet):
+    # Воркер обслуживает общий сокет сам; accept на неблокирующем сокете просто уступает соседу.
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGHUP, signal.SIG_DFL)
+    signal.signal(signal.SIGUSR1, signal.SIG_DFL)
+    signal.pthread_sigmask(signal.SIG_UNBLOCK, MASTER_SIGNALS)
+
+    handler = WSGIRequestHandler
+    if quiet:
+        handler = type('QuietRequestHandler', (WSGIRequestHandler,), {'log_message': lambda *args: None})
+    server = WSGIServer(listener.getsockname()[:2], handler, bind_and_activate=False)
+    server.socket.close()
+    server.socket = listener
+    server.server_name, server.server_port = listener.getsockname()[:2]
+    server.timeout = POLL_INTERVAL
+    server.setup_environ()
+    server.set_app(application)
+    while not stopping:
+        server.handle_request()
+    return 0
+
+
+class Command(BaseCommand):
+    help = 'Prefork-сервер: приложение прогревается в мастере, воркеры делят его страницы copy-on-write'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bind', default='127.0.0.1:8000', help='host:port общего сокета')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--backlog', type=int, default=128)
+        parser.add_argument('--no-freeze', action='store_true', help='Не вызывать gc.freeze() — для сравнения памяти')
+        parser.add_argument('--report', action='store_true', help='Показать память воркеров после запуска')
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1:
+            raise CommandError('--workers: нужен хотя бы один воркер')
+        self.freeze = not options['no_freeze']
+        self.quiet = options['verbosity'] < 2
+        self.workers = {}
+
+        # Не myproject.wsgi: он прогревал бы приложение сам, а прогрев и так идёт в _preload.
+        self.application = get_wsgi_application()
+        # Мастер останавливает наблюдатель перед fork, воркеры запускают каждый свой.
+        watch_catalog_on_startup()
+
+        host, port = _parse_bind(options['bind'])
+        try:
+            family = socket.AF_INET6 if ':' in host else socket.AF_INET
+            self.listener = socket.create_server((host, port), family=family, backlog=options['backlog'])
+        except OSError as e:
+            raise CommandError(f'Не удалось открыть {host}:{port}: {e}')
+        self.listener.setblocking(False)
+
+        self._preload(reload=False)
+        signal.pthread_sigmask(signal.SIG_BLOCK, MASTER_SIGNALS)
+        self._spawn(options['workers'])
+        self.stdout.write(f'Слушаю http://{host}:{port}/, воркеров: {options["workers"]}, мастер {os.getpid()}')
+        report_at = time.monotonic() + 1 if options['report'] else None
+
+        try:
+            while True:
+                received = signal.sigtimedwait(MASTER_SIGNALS, POLL_INTERVAL)
+                if report_at is not None and time.monotonic() >= report_at:
+                    report_at = None
+                    self._report()
+                if received is None:
+                    continue
+                if received.si_signo in (signal.SIGTERM, signal.SIGINT):
+                    break
+                if received.si_signo == signal.SIGHUP:
+                    self._reload(options['workers'])
+                elif received.si_signo == signal.SIGUSR1:
+                    self._report()
+                elif received.si_signo == signal.SIGCHLD:
+                    self._reap(options['workers'])
+        finally:
+            self._stop(list(self.workers))
+            self.listener.close()
+
+    def _preload(self, reload):
+        # Всё, что воркеры иначе строили бы сами, собирается один раз до fork.
+        if reload:
+            reload_catalog(settings.TEAMS_DATA_FILE)
+        started = time.perf_counter()
+        run_warmup()
+        get_engine()
+        connections.close_all()
+        # Фоновые потоки мастера останавливаются до fork: блокировка, взятая потоком в момент fork,
+        # осталась бы в воркере занятой навсегда. Наблюдатель каталога воркеры запускают сами.
+        watcher = get_watcher()
+        if watcher is not None:
+            watcher.suspend()
+        close_profile_store()
+        gc.collect()
+        if self.freeze:
+            # Объекты уходят из поколений GC: сборщик в воркерах не трогает их заголовки и не копирует страницы.
+            gc.freeze()
+        self.stdout.write(
+            f'Предзагрузка {(time.perf_counter() - started) * 1000:.0f} мс, '
+            f'заморожено объектов: {gc.get_freeze_count()}'
+        )
+
+    def _spawn(self, count):
+        for _ in range(count):
+            pid = os.fork()
+            if pid == 0:
+                code = 1
+                try:
+                    code = _serve(self.listener, self.application, self.quiet)
+                except Exception:
+                    traceback.print_exc()
+                finally:
+                    os._exit(code)
+            self.workers[pid] = time.monotonic()
+
+    def _reap(self, count):
+        while self.workers:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if pid == 0:
+                break
+            if self.workers.pop(pid, None) is not None:
+                self.stderr.write(f'Воркер {pid} завершился (код {os.waitstatus_to_exitcode(status)}), перезапускаю')
+        missing = count - len(self.workers)
+        if missing > 0:
+            self._spawn(missing)
+
+    def _reload(self, count):
+        # Новое поколение стартует раньше, чем старое закроется, — сокет не остаётся без слушателей.
+        previous = list(self.workers)
+        if self.freeze:
+            gc.unfreeze()
+        try:
+            self._preload(reload=True)
+        except (OSError, ValueError) as e:
+            self.stderr.write(f'Перезагрузка отменена: {e}')
+            if self.freeze:
+                gc.freeze()
+            return
+        for pid in previous:
+            self.workers.pop(pid)
+        self._spawn(count)
+        self._stop(previous)
+        self.stdout.write(f'Перезагружено: воркеры {sorted(self.workers)}')
+
+    def _stop(self, pids):
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.monotonic() + GRACEFUL_TIMEOUT
+        remaining = set(pids)
+        while remaining and time.monotonic() < deadline:
+            for pid in list(remaining):
+                try:
+                    if os.waitpid(pid, os.WNOHANG)[0]:
+                        remaining.discard(pid)
+                except ChildProcessError:
+                    remaining.discard(pid)
+            time.sleep(0.05)
+        for pid in remaining:
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+        for pid in pids:
+            self.workers.pop(pid, None)
+
+    def _report(self):
+        mib = 1024 * 1024
+        self.stdout.write(f'{"pid":>8}{"RSS MiB":>10}{"PSS MiB":>10}{"shared":>9}{"private":>9}')
+        rows = [('master', memory_usage(os.getpid()))]
+        rows += [(str(pid), memory_usage(pid)) for pid in sorted(self.workers)]
+        shared = []
+        private = []
+        for name, usage in rows:
+            if usage is None:
+                self.stdout.write(f'{name:>8}  нет данных /proc/<pid>/smaps_rollup')
+                continue
+            row_shared = usage['Shared_Clean'] + usage['Shared_Dirty']
+            row_private = usage['Private_Clean'] + usage['Private_Dirty']
+            if name != 'master':
+                shared.append(row_shared)
+                private.append(row_private)
+            self.stdout.write(
+                f'{name:>8}{usage["Rss"] / mib:>10.1f}{usage["Pss"] / mib:>10.1f}'
+                f'{row_shared / mib:>9.1f}{row_private / mib:>9.1f}'
+            )
+        if shared:
+            # Без общих страниц каждый воркер занимал бы их копию сам: это и есть экономия на ядро.
+            self.stdout.write(
+                f'в среднем на воркер: своих {sum(private) / len(private) / mib:.1f} MiB, '
+                f'общих с мастером {sum(shared) / len(shared) / mib:.1f} MiB'
+            )
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from myapp.warmup import run_warmup
+
+
+class Command(BaseCommand):
+    help = 'Прогревает шаблоны, переводы, каталог и поисковый индекс'
+
+    def handle(self, *args, **options):
+        total = 0.0
+        for name, elapsed, detail in run_warmup():
+            total += elapsed
+            self.stdout.write(f'{name:<14}{elapsed * 1000:>9.1f} ms  {detail}')
+        self.stdout.write(f'{"total":<14}{total * 1000:>9.1f} ms')
@@ -0,0 +1,130 @@
+import threading
+import time
+from bisect import bisect_left
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+METRICS = {
+    'myapp_request_duration_seconds': ('histogram', LATENCY_BUCKETS, 'Время обработки запроса'),
+    'myapp_response_size_bytes': ('histogram', SIZE_BUCKETS, 'Размер тела ответа'),
+    'myapp_template_render_seconds': ('histogram', LATENCY_BUCKETS, 'Время рендеринга шаблона'),
+    'myapp_cookie_parse_seconds': ('histogram', LATENCY_BUCKETS, 'Время разбора cookie избранного'),
+    'myapp_queue_time_seconds': ('histogram', LATENCY_BUCKETS, 'Ожидание запроса до воркера по X-Request-Start'),
+    'myapp_responses_total': ('counter', None, 'Ответы по статусу'),
+    'myapp_compression_bytes_total': ('counter', None, 'Байты ответов до и после сжатия'),
+    'myapp_compression_seconds_total': ('counter', None, 'Время сжатия ответов'),
+    'myapp_admission_rejected_total': ('counter', None, 'Запросы, отклонённые контролем нагрузки'),
+}
+
+
+class _Shard:
+    __slots__ = ('histograms', 'counters')
+
+    def __init__(self):
+        self.histograms = {}
+        self.counters = {}
+
+
+class MetricsRegistry:
+    # Каждый поток пишет в свой шард без блокировок; шарды складываются только при выгрузке.
+    def __init__(self):
+        self._local = threading.local()
+        self._shards = []
+        self._lock = threading.Lock()
+        self._collectors = []
+
+    def _shard(self):
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = _Shard()
+            with self._lock:
+                self._shards.append(shard)
+            return shard
+
+    def observe(self, name, labels, value):
+        histograms = self._shard().histograms
+        key = (name, labels)
+        histogram = histograms.get(key)
+        if histogram is None:
+            histogram = histograms[key] = [0] * (len(METRICS[name][1]) + 1) + [0.0]
+        histogram[bisect_left(METRICS[name][1], value)] += 1
+        histogram[-1] += value
+
+    def inc(self, name, labels, amount=1):
+        counters = self._shard().counters
+        key = (name, labels)
+        counters[key] = counters.get(key, 0) + amount
+
+    def record_request(self, view, status, duration, size):
+        labels = (('view', view),)
+        self.observe('myapp_request_duration_seconds', labels, duration)
+        self.inc('myapp_responses_total', (('view', view), ('status', str(status))))
+        if size is not None:
+            self.observe('myapp_response_size_bytes', labels, size)
+
+    def record_template_render(self, template_name, duration):
+        self.observe('myapp_template_render_seconds', (('template', template_name),), duration)
+
+    def record_cookie_parse(self, duration):
+        self.observe('myapp_cookie_parse_seconds', (), duration)
+
+    def add_collector(self, collector):
+        self._collectors.append(collector)
+
+    def _snapshot(self):
+        histograms = {}
+        counters = {}
+        with self._lock:
+            shards = list(self._shards)
+        for shard in shards:
+            for key, values in list(shard.histograms.items()):
+                total = histograms.setdefault(key, [0] * len(values))
+                for index, value in enumerate(values):
+                    total[index] += value
+            for key, value in list(shard.counters.items()):
+                counters[key] = counters.get(key, 0) + value
+        return histograms, counters
+
+    def render(self):
+        histograms, counters = self._snapshot()
+        lines = []
+        for name, (kind, buckets, help_text) in METRICS.items():
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            if kind == 'counter':
+                for (metric, labels), value in sorted(counters.items()):
+                    if metric == name:
+                        lines.append(f'{name}{_labels(labels)} {value}')
+                continue
+            for (metric, labels), values in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(buckets + ('+Inf',), values):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{_labels(labels + (("le", str(bound)),))} {cumulative}')
+                lines.append(f'{name}_sum{_labels(labels)} {values[-1]}')
+                lines.append(f'{name}_count{_labels(labels)} {cumulative}')
+        for collector in self._collectors:
+            lines.extend(collector())
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{value}"' for key, value in labels) + '}'
+
+
+registry = MetricsRegistry()
+
+
+def measure_overhead(iterations=100000):
+    scratch = MetricsRegistry()
+    started = time.perf_counter()
+    for _ in range(iterations):
+        request_started = time.perf_counter()
+        scratch.record_request('home', 200, time.perf_counter() - request_started, 4096)
+    return (time.perf_counter() - started) / iterations
@@ -1,26 +1,190 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
 from django.utils import translation
-import json
+
+from .admission import get_controller, route_class
+from .compression import compress_response
+from .metrics import registry
+from .profiling import RequestProfiler
+from .preferences import Preferences
 
 class PreferencesMiddleware:
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
 
     def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
         self.process_request(request)
         response = self.get_response(request)
-        return response
+        return self.process_response(request, response)
+
+    async def __acall__(self, request):
+        self.process_request(request)
+        preferences = request.preferences
+        await preferences.aload_favorites()
+        response = await self.get_response(request)
+        if preferences.store is not None and preferences.needs_migration:
+            await preferences.asave_favorites(lambda favorites: favorites)
+        return self.process_response(request, response)
 
     def process_request(self, request):
-        language = request.COOKIES.get('django_language')
+        request.preferences = Preferences(request)
+        request._previous_language = False
+        language = request.preferences.language_cookie
         if language:
+            request._previous_language = translation.get_language()
             translation.activate(language)
             request.LANGUAGE_CODE = language
-        
-        theme = request.COOKIES.get('theme', 'light')
-        request.theme = theme
-        
-        favorites = request.COOKIES.get('favorite_teams', '[]')
+
+    def process_response(self, request, response):
+        request.preferences.write_cookies(response)
+        # Язык активируется в потоке воркера; возвращаем прежний, чтобы он не достался следующему запросу.
+        previous = request._previous_language
+        if previous:
+            translation.activate(previous)
+        elif previous is None:
+            translation.deactivate()
+        return response
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        started = time.perf_counter()
+        response = self.get_response(request)
+        self.record(request, response, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        self.record(request, response, time.perf_counter() - started)
+        return response
+
+    def record(self, request, response, duration):
+        match = request.resolver_match
+        view = match.url_name if match and match.url_name else 'unmatched'
+        size = None if response.streaming else len(response.content)
+        registry.record_request(view, response.status_code, duration, size)
+
+
+class AdmissionMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'ADMISSION_CONTROL_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.controller = get_controller()
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        route = self.classify(request)
+        if route is None:
+            return self.get_response(request)
+        rejected = self.controller.admit(request, route)
+        if rejected is not None:
+            return rejected
         try:
-            request.favorite_teams = json.loads(favorites)
-        except (json.JSONDecodeError, TypeError):
-            request.favorite_teams = []
\ No newline at end of file
+            response = self.get_response(request)
+        except BaseException:
+            self.controller.release(route)
+            raise
+        return self.controller.release_on_close(response, route)
+
+    async def __acall__(self, request):
+        route = self.classify(request)
+        if route is None:
+            return await self.get_response(request)
+        rejected = self.controller.admit(request, route)
+        if rejected is not None:
+            return rejected
+        try:
+            response = await self.get_response(request)
+        except BaseException:
+            self.controller.release(route)
+            raise
+        return self.controller.release_on_close(response, route)
+
+    def classify(self, request):
+        # Маршрут определяется до CSRF и разбора тела, чтобы отказ стоил как можно меньше.
+        match, route = route_class(request)
+        if match is not None:
+            request.resolver_match = match
+        return route
+
+
+class CompressionMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'COMPRESSION_LEVEL', 0):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return compress_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return compress_response(request, await self.get_response(request))
+
+
+class ProfilingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PROFILING_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.profiler = RequestProfiler()
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        profile = self.profiler.start(request)
+        if profile is None:
+            return self.get_response(request)
+        try:
+            return self.get_response(request)
+        finally:
+            self.profiler.finish(profile, request)
+
+    async def __acall__(self, request):
+        # Под ASGI запросы не профилируются: cProfile, включённый через await, собрал бы кадры
+        # всех корутин, которые цикл событий выполнял в это время, а не только этого запроса.
+        return await self.get_response(request)
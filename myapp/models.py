@@ -1,117 +1,14 @@
+import hashlib
+import json
+import threading
+from collections import namedtuple
+from datetime import datetime, timezone
+from types import MappingProxyType
+
+from django.conf import settings
 from django.db import models
 
-TEAMS_DATA = {
-    1: {
-        'id': 1,
-        'name': 'Los Angeles Lakers',
-        'city': 'Los Angeles',
-        'conference': 'Western',
-        'division': 'Pacific',
-        'founded': 1947,
-        'championships': 17,
-        'description': 'Одна из самых успешных франшиз в истории НБА, известная своими фиолетовыми и золотыми цветами.',
-        'colors': ['#552583', '#FDB927']
-    },
-    2: {
-        'id': 2,
-        'name': 'Boston Celtics',
-        'city': 'Boston',
-        'conference': 'Eastern',
-        'division': 'Atlantic',
-        'founded': 1946,
-        'championships': 18,
-        'description': 'Историческая франшиза с наибольшим количеством чемпионств НБА, известная своими зелеными и белыми цветами.',
-        'colors': ['#007A33', '#BA9653']
-    },
-    3: {
-        'id': 3,
-        'name': 'Golden State Warriors',
-        'city': 'San Francisco',
-        'conference': 'Western',
-        'division': 'Pacific',
-        'founded': 1946,
-        'championships': 7,
-        'description': 'Известна своим быстрым стилем игры и превосходством в трехочковых бросках.',
-        'colors': ['#1D428A', '#FFC72C']
-    },
-    4: {
-        'id': 4,
-        'name': 'Chicago Bulls',
-        'city': 'Chicago',
-        'conference': 'Eastern',
-        'division': 'Central',
-        'founded': 1966,
-        'championships': 6,
-        'description': 'Известна эпохой Майкла Джордана и шестью чемпионскими титулами в 1990-х годах.',
-        'colors': ['#CE1141', '#000000']
-    },
-    5: {
-        'id': 5,
-        'name': 'Miami Heat',
-        'city': 'Miami',
-        'conference': 'Eastern',
-        'division': 'Southeast',
-        'founded': 1988,
-        'championships': 3,
-        'description': 'Известна своей "Культурой Heat" и несколькими чемпионскими титулами.',
-        'colors': ['#98002E', '#F9A01B']
-    },
-    6: {
-        'id': 6,
-        'name': 'Brooklyn Nets',
-        'city': 'Brooklyn',
-        'conference': 'Eastern',
-        'division': 'Atlantic',
-        'founded': 1967,
-        'championships': 2,
-        'description': 'Современная франшиза, известная звездными составами и характерной черной формой.',
-        'colors': ['#000000', '#FFFFFF']
-    },
-    7: {
-        'id': 7,
-        'name': 'Milwaukee Bucks',
-        'city': 'Milwaukee',
-        'conference': 'Eastern',
-        'division': 'Central',
-        'founded': 1968,
-        'championships': 2,
-        'description': 'Известна своей страстной фанбазой и недавним чемпионским успехом с Гианнисом Антетокумпо.',
-        'colors': ['#00471B', '#EEE1C6']
-    },
-    8: {
-        'id': 8,
-        'name': 'Phoenix Suns',
-        'city': 'Phoenix',
-        'conference': 'Western',
-        'division': 'Pacific',
-        'founded': 1968,
-        'championships': 0,
-        'description': 'Известна своими оранжевыми и фиолетовыми цветами и быстрым стилем игры "Семь секунд или меньше".',
-        'colors': ['#1D1160', '#E56020']
-    },
-    9: {
-        'id': 9,
-        'name': 'Dallas Mavericks',
-        'city': 'Dallas',
-        'conference': 'Western',
-        'division': 'Southwest',
-        'founded': 1980,
-        'championships': 1,
-        'description': 'Известна своим уникальным стилем и чемпионским туром под руководством Дирка Новицки.',
-        'colors': ['#00538C', '#002B5E']
-    },
-    10: {
-        'id': 10,
-        'name': 'Denver Nuggets',
-        'city': 'Denver',
-        'conference': 'Western',
-        'division': 'Northwest',
-        'founded': 1976,
-        'championships': 1,
-        'description': 'Известна своей горной идентичностью и недавним чемпионским успехом с Николой Йокичем.',
-        'colors': ['#0E2240', '#FEC524']
-    }
-}
+from .search import SearchIndex
 
 LANGUAGE_CHOICES = [
     ('en', 'English'),
@@ -124,8 +21,115 @@ THEME_CHOICES = [
     ('yellow', 'Yellow'),
 ]
 
+TEAM_FIELDS = ('id', 'name', 'city', 'conference', 'division', 'founded', 'championships', 'description', 'colors', 'about')
+
+DETAIL_LABELS = {
+    'en': ('{} Conference', '{} Division'),
+    'ru': ('{} Конференция', '{} Дивизион'),
+}
+
+
+class Team(namedtuple('Team', TEAM_FIELDS)):
+    __slots__ = ()
+
+    @classmethod
+    def from_dict(cls, data):
+        # about появился позже остальных полей: старые записи без него остаются валидными.
+        values = {field: data[field] for field in TEAM_FIELDS if field != 'about'}
+        values['colors'] = tuple(values['colors'])
+        values['about'] = MappingProxyType(dict(data.get('about') or {}))
+        return cls(**values)
+
+    def to_dict(self, is_favorite=False):
+        data = self._asdict()
+        del data['about']
+        data['colors'] = list(self.colors)
+        data['is_favorite'] = is_favorite
+        return data
+
+    def to_detail(self, language):
+        conference_label, division_label = DETAIL_LABELS.get(language, DETAIL_LABELS['en'])
+        data = self.to_dict()
+        del data['is_favorite']
+        data['conference_label'] = conference_label.format(self.conference)
+        data['division_label'] = division_label.format(self.division)
+        data['about'] = self.about.get(language) or self.about.get('en', self.description)
+        return data
+
+
+def _group_by(teams, field):
+    groups = {}
+    for team in teams:
+        groups.setdefault(getattr(team, field), []).append(team)
+    return MappingProxyType({key: tuple(members) for key, members in groups.items()})
+
+
+def _serialize_details(teams):
+    # Тело ответа /teams/<id>/ собирается один раз на каталог, а не на каждый запрос.
+    details = {}
+    for team in teams:
+        for language, language_name in settings.LANGUAGES:
+            body = json.dumps(team.to_detail(language), ensure_ascii=False).encode()
+            details[team.id, language] = (hashlib.blake2b(body, digest_size=8).hexdigest(), body)
+    return MappingProxyType(details)
+
+
+class TeamCatalog:
+    __slots__ = ('teams', 'by_id', 'by_conference', 'by_division', 'search_index', 'details', 'version', 'loaded_at')
+
+    def __init__(self, teams, version):
+        self.teams = tuple(teams)
+        self.by_id = MappingProxyType({team.id: team for team in self.teams})
+        self.by_conference = _group_by(self.teams, 'conference')
+        self.by_division = _group_by(self.teams, 'division')
+        self.search_index = SearchIndex(self.teams)
+        self.details = _serialize_details(self.teams)
+        self.version = version
+        self.loaded_at = datetime.now(timezone.utc).replace(microsecond=0)
+
+    def __len__(self):
+        return len(self.teams)
+
+    def get(self, team_id):
+        return self.by_id.get(team_id)
+
+    def search(self, query):
+        return self.search_index.search(query)
+
+    def detail(self, team_id, language):
+        return self.details.get((team_id, language))
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog():
+    catalog = _catalog
+    if catalog is None:
+        catalog = _load_catalog()
+    return catalog
+
+
+def _load_catalog():
+    global _catalog
+    from .loader import read_catalog
+
+    with _catalog_lock:
+        if _catalog is None:
+            _catalog = read_catalog(settings.TEAMS_DATA_FILE)
+        return _catalog
+
+
+def set_catalog(catalog):
+    global _catalog
+    previous, _catalog = _catalog, catalog
+    return previous
+
+
 def get_team_by_id(team_id):
-    return TEAMS_DATA.get(team_id)
+    return get_catalog().get(team_id)
+
 
 def get_all_teams():
-    return list(TEAMS_DATA.values())
\ No newline at end of file
+    return get_catalog().teams
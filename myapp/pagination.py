@@ -0,0 +1,62 @@
+import base64
+import binascii
+import json
+
+STREAM_CHUNK_SIZE = 100
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(version, offset):
+    return base64.urlsafe_b64encode(f'{version}:{offset}'.encode()).rstrip(b'=').decode('ascii')
+
+
+def decode_cursor(cursor, version):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('ascii')
+        cursor_version, offset = raw.rsplit(':', 1)
+        offset = int(offset)
+    except (binascii.Error, ValueError, UnicodeDecodeError):
+        raise InvalidCursor('Неверный курсор')
+    if cursor_version != str(version):
+        raise InvalidCursor('Курсор устарел, начните заново')
+    if offset < 0:
+        raise InvalidCursor('Неверный курсор')
+    return offset
+
+
+def parse_limit(value, default, maximum):
+    if value in (None, ''):
+        return default
+    try:
+        limit = int(value)
+    except ValueError:
+        raise InvalidCursor('Неверный размер страницы')
+    if limit < 1:
+        raise InvalidCursor('Неверный размер страницы')
+    return min(limit, maximum)
+
+
+def iter_json_array(key, items, serialize, chunk_size=STREAM_CHUNK_SIZE, trailer=None, encoded=False):
+    # encoded: serialize сразу возвращает готовый JSON в байтах, как TeamSerializer.object.
+    encode = serialize if encoded else lambda item: json.dumps(serialize(item)).encode()
+    yield b'{' + json.dumps(key).encode() + b':['
+    chunk = []
+    first = True
+    for item in items:
+        chunk.append(encode(item))
+        if len(chunk) >= chunk_size:
+            yield (b'' if first else b',') + b','.join(chunk)
+            first = False
+            chunk = []
+    if chunk:
+        yield (b'' if first else b',') + b','.join(chunk)
+    # Поля после массива, например избранное, — одним последним куском.
+    yield b']' + ''.join(f',{json.dumps(name)}:{json.dumps(value)}' for name, value in (trailer or {}).items()).encode() + b'}'
+
+
+async def aiter_json_array(key, items, serialize, chunk_size=STREAM_CHUNK_SIZE, trailer=None, encoded=False):
+    for chunk in iter_json_array(key, items, serialize, chunk_size, trailer, encoded):
+        yield chunk
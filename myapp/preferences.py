@@ -0,0 +1,189 @@
+import base64
+import binascii
+import json
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils.functional import cached_property
+
+from .metrics import registry
+from .models import THEME_CHOICES, get_catalog
+
+LANGUAGE_COOKIE = settings.LANGUAGE_COOKIE_NAME
+THEME_COOKIE = 'theme'
+FAVORITES_COOKIE = 'favorite_teams'
+PROFILE_COOKIE = 'profile_id'
+COOKIE_MAX_AGE = 365 * 24 * 60 * 60
+
+DEFAULT_THEME = 'light'
+FAVORITES_FORMAT = '1.'
+# Разница соседних id в cookie — не больше 4 байт varint, а самих id — не больше, чем команд в каталоге.
+MAX_VARINT_BYTES = 4
+
+_LANGUAGES = frozenset(code for code, name in settings.LANGUAGES)
+_THEMES = frozenset(code for code, name in THEME_CHOICES)
+
+
+def is_team_id(value):
+    return isinstance(value, int) and not isinstance(value, bool) and value > 0
+
+
+def encode_favorites(team_ids):
+    payload = bytearray()
+    previous = 0
+    for team_id in sorted(set(team_ids)):
+        delta = team_id - previous
+        previous = team_id
+        while delta >= 0x80:
+            payload.append(delta & 0x7F | 0x80)
+            delta >>= 7
+        payload.append(delta)
+    return FAVORITES_FORMAT + base64.urlsafe_b64encode(payload).rstrip(b'=').decode('ascii')
+
+
+def decode_favorites(value):
+    if not value:
+        return frozenset()
+    if not value.startswith(FAVORITES_FORMAT):
+        return _decode_legacy_favorites(value)
+
+    encoded = value[len(FAVORITES_FORMAT):]
+    try:
+        payload = base64.urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4))
+    except (binascii.Error, ValueError):
+        return frozenset()
+
+    # Принимаются только команды каталога: произвольные id из cookie не попадают в ключи кешей, ETag и фильтр /events/.
+    by_id = get_catalog().by_id
+    if len(payload) > len(by_id) * MAX_VARINT_BYTES:
+        return frozenset()
+
+    team_ids = []
+    team_id = delta = shift = 0
+    for byte in payload:
+        delta |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            if shift >= 7 * MAX_VARINT_BYTES:
+                return frozenset()
+            continue
+        team_id += delta
+        team_ids.append(team_id)
+        delta = shift = 0
+    return frozenset(team_id for team_id in team_ids if team_id in by_id)
+
+
+def _decode_legacy_favorites(value):
+    try:
+        team_ids = json.loads(value)
+    except (json.JSONDecodeError, TypeError):
+        return frozenset()
+    if not isinstance(team_ids, list):
+        return frozenset()
+    by_id = get_catalog().by_id
+    if len(team_ids) > len(by_id):
+        return frozenset()
+    return frozenset(team_id for team_id in team_ids if is_team_id(team_id) and team_id in by_id)
+
+
+def set_preference_cookie(response, name, value):
+    response.set_cookie(name, value, max_age=COOKIE_MAX_AGE, path='/')
+
+
+def set_favorites_cookie(response, team_ids):
+    set_preference_cookie(response, FAVORITES_COOKIE, encode_favorites(team_ids))
+
+
+class Preferences:
+    def __init__(self, request):
+        self._request = request
+        self.saved_favorites = None
+        self._new_profile_id = None
+
+    @cached_property
+    def language_cookie(self):
+        language = self._request.COOKIES.get(LANGUAGE_COOKIE)
+        return language if language in _LANGUAGES else None
+
+    @cached_property
+    def language(self):
+        return self.language_cookie or getattr(self._request, 'LANGUAGE_CODE', None) or settings.LANGUAGE_CODE
+
+    @cached_property
+    def theme(self):
+        theme = self._request.COOKIES.get(THEME_COOKIE)
+        return theme if theme in _THEMES else DEFAULT_THEME
+
+    @cached_property
+    def store(self):
+        from .profiles import get_profile_store
+        return get_profile_store()
+
+    @cached_property
+    def profile_id(self):
+        from .profiles import unsign_profile_id
+        if self.store is None:
+            return None
+        return unsign_profile_id(self._request.COOKIES.get(PROFILE_COOKIE))
+
+    @cached_property
+    def favorites(self):
+        if self.profile_id:
+            return self.store.get(self.profile_id)
+        started = time.perf_counter()
+        favorites = decode_favorites(self._request.COOKIES.get(FAVORITES_COOKIE))
+        registry.record_cookie_parse(time.perf_counter() - started)
+        return favorites
+
+    async def aload_favorites(self):
+        # В async-коде промах кеша профилей читает SQLite в потоке, а не в цикле событий.
+        if not self.profile_id or 'favorites' in self.__dict__:
+            return
+        favorites = self.store.peek(self.profile_id)
+        if favorites is None:
+            favorites = await sync_to_async(self.store.get)(self.profile_id)
+        self.__dict__['favorites'] = favorites
+
+    @property
+    def has_legacy_favorites(self):
+        value = self._request.COOKIES.get(FAVORITES_COOKIE)
+        if self.store is not None:
+            # С серверным хранилищем любое избранное в cookie переносится в профиль.
+            return bool(value) and not self.profile_id
+        return bool(value) and not value.startswith(FAVORITES_FORMAT)
+
+    def save_favorites(self, change):
+        if self.store is None:
+            favorites = frozenset(change(self.favorites))
+        elif self.profile_id:
+            favorites = self.store.update(self.profile_id, change)
+        else:
+            from .profiles import new_profile_id
+            base = self.favorites
+            self._new_profile_id = new_profile_id()
+            favorites = self.store.update(self._new_profile_id, lambda current: change(base))
+        self.saved_favorites = self.__dict__['favorites'] = favorites
+        return favorites
+
+    async def asave_favorites(self, change):
+        if self.store is None:
+            return self.save_favorites(change)
+        return await sync_to_async(self.save_favorites)(change)
+
+    @property
+    def needs_migration(self):
+        return self.saved_favorites is None and self.has_legacy_favorites
+
+    def write_cookies(self, response):
+        if self.needs_migration:
+            self.save_favorites(lambda favorites: favorites)
+        if self.store is None:
+            if self.saved_favorites is not None and FAVORITES_COOKIE not in response.cookies:
+                set_favorites_cookie(response, self.saved_favorites)
+            return
+        if self._new_profile_id:
+            from .profiles import sign_profile_id
+            set_preference_cookie(response, PROFILE_COOKIE, sign_profile_id(self._new_profile_id))
+        if FAVORITES_COOKIE in self._request.COOKIES and FAVORITES_COOKIE not in response.cookies:
+            response.delete_cookie(FAVORITES_COOKIE, path='/')
@@ -0,0 +1,290 @@
+import atexit
+import logging
+import os
+import re
+import secrets
+import sqlite3
+import threading
+import time
+
+from django.conf import settings
+from django.core import signing
+
+from .cache import LRUCache
+from .metrics import registry
+from .preferences import decode_favorites, encode_favorites
+
+logger = logging.getLogger(__name__)
+
+PROFILE_ID_RE = re.compile(r'[A-Za-z0-9_-]{22}')
+PROFILE_SALT = 'myapp.profiles'
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS profiles (
+    id TEXT PRIMARY KEY,
+    favorites TEXT NOT NULL,
+    updated_at REAL NOT NULL
+) WITHOUT ROWID
+'''
+UPSERT = '''
+INSERT INTO profiles (id, favorites, updated_at) VALUES (?, ?, ?)
+ON CONFLICT (id) DO UPDATE SET favorites = excluded.favorites, updated_at = excluded.updated_at
+'''
+SELECT = 'SELECT favorites FROM profiles WHERE id = ?'
+
+
+def new_profile_id():
+    return secrets.token_urlsafe(16)
+
+
+def is_profile_id(value):
+    return bool(value) and PROFILE_ID_RE.fullmatch(value) is not None
+
+
+def sign_profile_id(profile_id):
+    return signing.Signer(salt=PROFILE_SALT).sign(profile_id)
+
+
+def unsign_profile_id(value):
+    # Принимаются только id, выданные сервером: без SECRET_KEY подпись не подделать.
+    if not value:
+        return None
+    try:
+        profile_id = signing.Signer(salt=PROFILE_SALT).unsign(value)
+    except signing.BadSignature:
+        return None
+    return profile_id if is_profile_id(profile_id) else None
+
+
+def connect(path):
+    connection = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+    # WAL: читатели не ждут писателя, а synchronous=NORMAL не делает fsync на каждый коммит.
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.execute('PRAGMA synchronous=NORMAL')
+    return connection
+
+
+class ProfileStore:
+    def __init__(self, path, cache_size=10000, flush_interval=0.05, cache_ttl=1.0):
+        self.path = str(path)
+        self.flush_interval = flush_interval
+        self.cache_ttl = cache_ttl
+        self.cache = LRUCache(cache_size)
+        self.db_reads = 0
+        self.writes = 0
+        self.flushed = 0
+        self.transactions = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending = {}
+        self._flushing = {}
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._writer = connect(self.path)
+        self._writer.execute(SCHEMA)
+        self._thread = threading.Thread(target=self._run, name='profile-writer', daemon=True)
+        self._thread.start()
+
+    def _reader(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = connect(self.path)
+        return connection
+
+    def _unsaved(self, profile_id):
+        entry = self._pending.get(profile_id)
+        if entry is None:
+            entry = self._flushing.get(profile_id)
+        return None if entry is None else entry[0]
+
+    def _cached(self, profile_id):
+        # Другие процессы пишут в ту же базу мимо этого кеша, поэтому запись в нём живёт cache_ttl секунд.
+        entry = self.cache.get(profile_id)
+        if entry is None or entry[1] < time.monotonic():
+            return None
+        return entry[0]
+
+    def _remember(self, profile_id, favorites):
+        self.cache.set(profile_id, (favorites, time.monotonic() + self.cache_ttl))
+
+    def _latest(self, profile_id):
+        favorites = self._unsaved(profile_id)
+        if favorites is None:
+            favorites = self._cached(profile_id)
+        return favorites
+
+    def peek(self, profile_id):
+        # Избранное без обращения к SQLite; None, если его нет ни в очереди, ни в кеше.
+        with self._lock:
+            return self._latest(profile_id)
+
+    def get(self, profile_id):
+        with self._lock:
+            favorites = self._latest(profile_id)
+            writes = self.writes
+        if favorites is None:
+            self.db_reads += 1
+            row = self._reader().execute(SELECT, (profile_id,)).fetchone()
+            favorites = decode_favorites(row[0]) if row else frozenset()
+            with self._lock:
+                # Пока шло чтение, update() мог сохранить более новое избранное: прочитанное его не затирает.
+                latest = self._latest(profile_id)
+                if latest is not None:
+                    favorites = latest
+                elif self.writes == writes:
+                    self._remember(profile_id, favorites)
+        return favorites
+
+    def update(self, profile_id, change):
+        # Возвращается ожидаемый результат по известной процессу версии, а в базе flush() применяет
+        # те же изменения к строке, прочитанной в транзакции записи: правки других процессов не теряются.
+        current = self.get(profile_id)
+        with self._lock:
+            # Пока читали, другой поток мог успеть записать: изменение применяется к самой свежей версии.
+            latest = self._latest(profile_id)
+            if latest is None:
+                latest = current
+            favorites = frozenset(change(latest))
+            pending = self._pending.get(profile_id)
+            changes = [change] if pending is None else pending[1] + [change]
+            self._pending[profile_id] = (favorites, changes)
+            self._remember(profile_id, favorites)
+            self.writes += 1
+        self._wake.set()
+        return favorites
+
+    def set(self, profile_id, favorites):
+        return self.update(profile_id, lambda current: favorites)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait()
+            # Короткая пауза собирает частые переключения в одну транзакцию.
+            self._stop.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except sqlite3.Error:
+                logger.exception('Не удалось записать профили в %s, повтор при следующей записи', self.path)
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                self._flushing, self._pending = self._pending, {}
+            saved = {}
+            try:
+                with self._writer:
+                    # IMMEDIATE берёт блокировку записи до чтения: другой процесс не запишет между SELECT и UPSERT.
+                    self._writer.execute('BEGIN IMMEDIATE')
+                    for profile_id, (_, changes) in self._flushing.items():
+                        row = self._writer.execute(SELECT, (profile_id,)).fetchone()
+                        favorites = decode_favorites(row[0]) if row else frozenset()
+                        for change in changes:
+                            favorites = frozenset(change(favorites))
+                        saved[profile_id] = favorites
+                    now = time.time()
+                    self._writer.executemany(
+                        UPSERT, [(profile_id, encode_favorites(favorites), now) for profile_id, favorites in saved.items()]
+                    )
+            except sqlite3.Error:
+                with self._lock:
+                    # Несохранённое возвращается в очередь перед более новыми изменениями того же профиля.
+                    for profile_id, (favorites, changes) in self._flushing.items():
+                        newer = self._pending.get(profile_id)
+                        self._pending[profile_id] = (favorites, changes) if newer is None else (newer[0], changes + newer[1])
+                    self._flushing = {}
+                raise
+            with self._lock:
+                self._flushing = {}
+                for profile_id, favorites in saved.items():
+                    if profile_id not in self._pending:
+                        self._remember(profile_id, favorites)
+            self.flushed += len(saved)
+            self.transactions += 1
+            return len(saved)
+
+    def close(self):
+        self._stop.set()
+        self._wake.set()
+        self._thread.join()
+        self.flush()
+        self._writer.close()
+
+    def stats(self):
+        return {
+            'pending': len(self._pending),
+            'writes': self.writes,
+            'flushed': self.flushed,
+            'transactions': self.transactions,
+            'db_reads': self.db_reads,
+            'cache': self.cache.stats(),
+        }
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_profile_store():
+    global _store
+    path = getattr(settings, 'PROFILE_STORE_PATH', None)
+    if not path:
+        return None
+    store = _store
+    if store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ProfileStore(
+                    path, settings.PROFILE_CACHE_SIZE, settings.PROFILE_FLUSH_INTERVAL, settings.PROFILE_CACHE_TTL
+                )
+                atexit.register(_store.close)
+            store = _store
+    return store
+
+
+def close_profile_store():
+    # Мастер prefork-сервера закрывает хранилище до fork: поток записи не должен держать блокировки в момент fork.
+    global _store
+    with _store_lock:
+        store, _store = _store, None
+    if store is not None:
+        atexit.unregister(store.close)
+        store.close()
+
+
+def _forget_store():
+    # Соединение SQLite и поток записи не переживают fork: воркер откроет своё хранилище,
+    # а закрывать при выходе хранилище родителя ему нельзя.
+    global _store, _store_lock
+    if _store is not None:
+        atexit.unregister(_store.close)
+    _store = None
+    _store_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_forget_store)
+
+
+def _profile_metrics():
+    store = _store
+    if store is None:
+        return []
+    stats = store.stats()
+    return [
+        '# TYPE myapp_profile_writes_total counter',
+        f'myapp_profile_writes_total {stats["writes"]}',
+        '# TYPE myapp_profile_flushed_total counter',
+        f'myapp_profile_flushed_total {stats["flushed"]}',
+        '# TYPE myapp_profile_transactions_total counter',
+        f'myapp_profile_transactions_total {stats["transactions"]}',
+        '# TYPE myapp_profile_db_reads_total counter',
+        f'myapp_profile_db_reads_total {stats["db_reads"]}',
+        '# TYPE myapp_profile_pending gauge',
+        f'myapp_profile_pending {stats["pending"]}',
+    ]
+
+
+registry.add_collector(_profile_metrics)
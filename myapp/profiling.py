@@ -0,0 +1,85 @@
+import cProfile
+import os
+import random
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core import signing
+
+TOKEN_VALUE = 'profile'
+TOKEN_SALT = 'myapp.profiling'
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def profile_dir():
+    return Path(_setting('PROFILING_DIR', settings.BASE_DIR / 'profiles'))
+
+
+def make_token():
+    return signing.TimestampSigner(salt=TOKEN_SALT).sign(TOKEN_VALUE)
+
+
+def is_valid_token(token):
+    try:
+        value = signing.TimestampSigner(salt=TOKEN_SALT).unsign(token, max_age=_setting('PROFILING_TOKEN_MAX_AGE', 3600))
+    except signing.BadSignature:
+        return False
+    return value == TOKEN_VALUE
+
+
+class ProfileRing:
+    def __init__(self, directory, size):
+        self.directory = Path(directory)
+        self.size = size
+
+    def write(self, profiler, label):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # Время в начале имени упорядочивает файлы всех процессов, pid не даёт воркерам совпасть по имени.
+        path = self.directory / f'{time.time_ns():020d}-{os.getpid()}-{label}.prof'
+        profiler.dump_stats(path)
+        self.prune()
+        return path
+
+    def prune(self):
+        # Кольцо общее для каталога: остаются size самых новых файлов, включая оставленные завершившимися воркерами.
+        for stale in sorted(self.directory.glob('*.prof'))[:-self.size]:
+            stale.unlink(missing_ok=True)
+
+
+class RequestProfiler:
+    def __init__(self):
+        self.sample_rate = _setting('PROFILING_SAMPLE_RATE', 0.0)
+        self.header = _setting('PROFILING_HEADER', 'X-Profile')
+        self.ring = ProfileRing(profile_dir(), _setting('PROFILING_MAX_FILES', 50))
+        # cProfile не допускает двух активных профилировщиков одновременно.
+        self._busy = threading.Lock()
+
+    def wanted(self, request):
+        token = request.headers.get(self.header)
+        if token:
+            return is_valid_token(token)
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def start(self, request):
+        if not self.wanted(request) or not self._busy.acquire(blocking=False):
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            self._busy.release()
+            return None
+        return profiler
+
+    def finish(self, profiler, request):
+        try:
+            profiler.disable()
+        finally:
+            self._busy.release()
+        match = request.resolver_match
+        self.ring.write(profiler, match.url_name if match and match.url_name else 'unmatched')
@@ -0,0 +1,108 @@
+import re
+import unicodedata
+
+SEARCH_FIELDS = ('name', 'city', 'description')
+
+MAX_PREFIX_LENGTH = 12
+MAX_GRAM_LENGTH = 3
+
+_TOKEN_RE = re.compile(r'\w+')
+
+_TRANSLITERATION = str.maketrans({
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ё': 'e',
+    'ж': 'zh', 'з': 'z', 'и': 'i', 'й': 'y', 'к': 'k', 'л': 'l', 'м': 'm',
+    'н': 'n', 'о': 'o', 'п': 'p', 'р': 'r', 'с': 's', 'т': 't', 'у': 'u',
+    'ф': 'f', 'х': 'kh', 'ц': 'ts', 'ч': 'ch', 'ш': 'sh', 'щ': 'shch',
+    'ъ': '', 'ы': 'y', 'ь': '', 'э': 'e', 'ю': 'yu', 'я': 'ya',
+})
+
+
+def normalize(text):
+    # Кириллица транслитерируется до NFKD, иначе «й» потеряет кратку.
+    text = text.casefold().translate(_TRANSLITERATION)
+    text = unicodedata.normalize('NFKD', text)
+    return ''.join(char for char in text if not unicodedata.combining(char))
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall(text)
+
+
+class SearchIndex:
+    __slots__ = ('teams', '_fields', '_tokens', '_prefixes', '_grams')
+
+    def __init__(self, teams):
+        self.teams = tuple(teams)
+        self._fields = []
+        self._tokens = []
+        self._prefixes = {}
+        self._grams = {}
+
+        for position, team in enumerate(self.teams):
+            fields = tuple(normalize(getattr(team, field)) for field in SEARCH_FIELDS)
+            field_tokens = tuple(frozenset(tokenize(text)) for text in fields)
+            self._fields.append(fields)
+            self._tokens.append(field_tokens)
+
+            for rank, tokens in enumerate(field_tokens):
+                for token in tokens:
+                    for end in range(1, min(len(token), MAX_PREFIX_LENGTH) + 1):
+                        ranks = self._prefixes.setdefault(token[:end], {})
+                        if ranks.get(position, rank) >= rank:
+                            ranks[position] = rank
+                    for size in range(1, MAX_GRAM_LENGTH + 1):
+                        for start in range(len(token) - size + 1):
+                            self._grams.setdefault(token[start:start + size], set()).add(position)
+
+        self._fields = tuple(self._fields)
+        self._tokens = tuple(self._tokens)
+
+    def search(self, query):
+        query = normalize(query).strip()
+        terms = tokenize(query)
+        if not terms:
+            return self.teams
+
+        scores = None
+        for term in dict.fromkeys(terms):
+            term_scores = self._match_term(term)
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {position: score + term_scores[position] for position, score in scores.items() if position in term_scores}
+            if not scores:
+                return ()
+
+        ranked = sorted(scores, key=lambda position: (not self._fields[position][0].startswith(query), scores[position], position))
+        return tuple(self.teams[position] for position in ranked)
+
+    def _match_term(self, term):
+        matches = dict(self._prefix_matches(term))
+        substring_rank = len(SEARCH_FIELDS)
+        for position in self._substring_candidates(term):
+            if position in matches:
+                continue
+            for rank, text in enumerate(self._fields[position]):
+                if term in text:
+                    matches[position] = substring_rank + rank
+                    break
+        return matches
+
+    def _prefix_matches(self, term):
+        ranks = self._prefixes.get(term[:MAX_PREFIX_LENGTH], {})
+        if len(term) <= MAX_PREFIX_LENGTH:
+            return ranks.items()
+        matches = []
+        for position in ranks:
+            for rank, tokens in enumerate(self._tokens[position]):
+                if any(token.startswith(term) for token in tokens):
+                    matches.append((position, rank))
+                    break
+        return matches
+
+    def _substring_candidates(self, term):
+        if len(term) <= MAX_GRAM_LENGTH:
+            return self._grams.get(term, ())
+        grams = {term[start:start + MAX_GRAM_LENGTH] for start in range(len(term) - MAX_GRAM_LENGTH + 1)}
+        postings = sorted((self._grams.get(gram, set()) for gram in grams), key=len)
+        return set.intersection(*postings)
@@ -0,0 +1,294 @@
+import io
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+
+from .models import get_catalog
+
+logger = logging.getLogger(__name__)
+
+GAME_COLUMNS = ('date', 'home', 'away', 'home_score', 'away_score')
+GAMES_HEADER = ','.join(GAME_COLUMNS)
+FIELDS_PER_ROW = len(GAME_COLUMNS) + 2
+NEWLINE = ord('\n')
+COMMA = ord(',')
+DASH = ord('-')
+# Сезон НБА начинается осенью: игры до августа относятся к сезону прошлого года.
+SEASON_START_MONTH = 8
+STANDINGS_GROUPS = ('conference', 'division')
+
+
+def parse_games(text):
+    if text.startswith(GAMES_HEADER):
+        text = text[len(GAMES_HEADER):]
+    text = text.strip()
+    if not text:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, empty, empty, empty
+    text = text.replace('\r', '')
+    raw = np.frombuffer(text.encode(), dtype=np.uint8)
+    newlines = raw == NEWLINE
+    line_numbers = np.cumsum(newlines)
+    rows = int(line_numbers[-1]) + 1
+    # Общее число полей совпадёт и при «съехавших» строках, поэтому запятые и дефисы даты считаются построчно.
+    if (np.bincount(line_numbers[raw == COMMA], minlength=rows) != len(GAME_COLUMNS) - 1).any():
+        raise ValueError(f'Ожидаются колонки {GAMES_HEADER}')
+    dashes = raw == DASH
+    if (np.bincount(line_numbers[dashes], minlength=rows) != 2).any():
+        raise ValueError('Неверная дата игры')
+    # Дата раскладывается на год, месяц и день, и вся порция разбирается одним вызовом loadtxt без построчного цикла.
+    try:
+        values = np.loadtxt(io.StringIO(text.replace('-', ',')), delimiter=',', dtype=np.int64, ndmin=2)
+    except (ValueError, OverflowError):
+        raise ValueError(f'Ожидаются колонки {GAMES_HEADER}')
+    if values.shape != (rows, FIELDS_PER_ROW):
+        raise ValueError(f'Ожидаются колонки {GAMES_HEADER}')
+    year, month, day, home, away, home_score, away_score = values.T
+    if ((month < 1) | (month > 12) | (day < 1) | (day > 31)).any():
+        raise ValueError('Неверная дата игры')
+    if (home < 1).any() or (away < 1).any() or (home == away).any():
+        raise ValueError('Неверные ID команд в результатах игр')
+    if (home_score == away_score).any():
+        raise ValueError('В игре НБА не бывает ничьих')
+    return year - (month < SEASON_START_MONTH), home, away, home_score, away_score
+
+
+def format_streak(streak):
+    if not streak:
+        return ''
+    return f'{"W" if streak > 0 else "L"}{abs(streak)}'
+
+
+class SeasonTable:
+    __slots__ = ('size', 'wins', 'losses', 'home_wins', 'home_losses', 'head_to_head', 'streak', 'games')
+
+    def __init__(self, size=0):
+        self.size = size
+        self.wins = np.zeros(size, dtype=np.int64)
+        self.losses = np.zeros(size, dtype=np.int64)
+        self.home_wins = np.zeros(size, dtype=np.int64)
+        self.home_losses = np.zeros(size, dtype=np.int64)
+        self.head_to_head = np.zeros((size, size), dtype=np.int64)
+        self.streak = np.zeros(size, dtype=np.int64)
+        self.games = 0
+
+    def ensure_size(self, size):
+        if size <= self.size:
+            return
+        grow = size - self.size
+        for name in ('wins', 'losses', 'home_wins', 'home_losses', 'streak'):
+            setattr(self, name, np.pad(getattr(self, name), (0, grow)))
+        self.head_to_head = np.pad(self.head_to_head, ((0, grow), (0, grow)))
+        self.size = size
+
+    def apply(self, home, away, home_won):
+        # Все счётчики — это суммы, поэтому новые игры просто добавляются к накопленным.
+        self.ensure_size(int(max(home.max(), away.max())) + 1)
+        winners = np.where(home_won, home, away)
+        losers = np.where(home_won, away, home)
+        self.wins += np.bincount(winners, minlength=self.size)
+        self.losses += np.bincount(losers, minlength=self.size)
+        self.home_wins += np.bincount(home[home_won], minlength=self.size)
+        self.home_losses += np.bincount(home[~home_won], minlength=self.size)
+        np.add.at(self.head_to_head, (winners, losers), 1)
+        self._update_streaks(home, away, home_won)
+        self.games += len(home)
+
+    def _update_streaks(self, home, away, home_won):
+        played = np.arange(len(home))
+        teams = np.concatenate((home, away))
+        won = np.concatenate((home_won, ~home_won))
+        order = np.lexsort((np.concatenate((played, played)), teams))
+        teams = teams[order]
+        won = won[order]
+
+        positions = np.arange(len(teams))
+        team_changes = np.r_[True, teams[1:] != teams[:-1]]
+        run_changes = team_changes | np.r_[True, won[1:] != won[:-1]]
+        team_start = np.maximum.accumulate(np.where(team_changes, positions, 0))
+        run_start = np.maximum.accumulate(np.where(run_changes, positions, 0))
+
+        last = np.flatnonzero(np.r_[teams[1:] != teams[:-1], True])
+        last_teams = teams[last]
+        sign = np.where(won[last], 1, -1)
+        length = last - run_start[last] + 1
+        previous = self.streak[last_teams]
+        # Серия продолжается, только если вся новая порция игр команды — тот же исход, что и прежняя серия.
+        extends = (run_start[last] == team_start[last]) & (np.sign(previous) == sign)
+        self.streak[last_teams] = np.where(extends, previous + sign * length, sign * length)
+
+    def rank(self, team_ids):
+        ids = np.asarray(team_ids, dtype=np.int64)
+        self.ensure_size(int(ids.max()) + 1 if len(ids) else 0)
+        wins = self.wins[ids]
+        losses = self.losses[ids]
+        played = wins + losses
+        pct = np.divide(wins, played, out=np.zeros(len(ids)), where=played > 0)
+
+        # Тай-брейк — личные встречи только между командами с одинаковым процентом побед.
+        tied = pct[:, None] == pct[None, :]
+        np.fill_diagonal(tied, False)
+        head_to_head = self.head_to_head[np.ix_(ids, ids)]
+        tied_wins = (head_to_head * tied).sum(axis=1)
+        tied_losses = (head_to_head.T * tied).sum(axis=1)
+        tied_played = tied_wins + tied_losses
+        tied_pct = np.divide(tied_wins, tied_played, out=np.full(len(ids), 0.5), where=tied_played > 0)
+
+        order = np.lexsort((ids, losses, -wins, -tied_pct, -pct))
+        leader = order[0] if len(order) else None
+        games_behind = ((wins[leader] - wins) + (losses - losses[leader])) / 2 if leader is not None else wins
+        home_wins = self.home_wins[ids]
+        home_losses = self.home_losses[ids]
+        streak = self.streak[ids]
+        return [
+            {
+                'team_id': int(ids[index]),
+                'wins': int(wins[index]),
+                'losses': int(losses[index]),
+                'pct': round(float(pct[index]), 3),
+                'games_behind': float(games_behind[index]),
+                'streak': format_streak(int(streak[index])),
+                'home': f'{home_wins[index]}-{home_losses[index]}',
+                'away': f'{wins[index] - home_wins[index]}-{losses[index] - home_losses[index]}',
+            }
+            for index in order
+        ]
+
+
+class StandingsEngine:
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._checked_at = None
+        self._reset()
+
+    def _reset(self):
+        self.seasons = {}
+        self.games = 0
+        self._offset = 0
+        self._inode = None
+        self._cache = {}
+
+    @property
+    def version(self):
+        return f'{self._inode}:{self.games}'
+
+    def maybe_refresh(self, interval):
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < interval:
+            return False
+        self._checked_at = now
+        try:
+            return self.refresh()
+        except (OSError, ValueError):
+            logger.exception('Не удалось дочитать результаты игр из %s, таблица не обновлена', self.path)
+            return False
+
+    def refresh(self):
+        with self._lock:
+            try:
+                stat = os.stat(self.path)
+            except FileNotFoundError:
+                if self.games:
+                    self._reset()
+                    return True
+                return False
+            if stat.st_ino != self._inode or stat.st_size < self._offset:
+                # Файл заменили или обрезали — дописанным его считать нельзя.
+                self._reset()
+                self._inode = stat.st_ino
+            if stat.st_size == self._offset:
+                return False
+            with open(self.path, 'rb') as handle:
+                handle.seek(self._offset)
+                data = handle.read(stat.st_size - self._offset)
+            # Незаконченную последнюю строку дочитаем при следующем обновлении.
+            complete = data.rfind(b'\n') + 1
+            if not complete:
+                return False
+            text = data[:complete].decode(errors='replace')
+            try:
+                self.ingest(text)
+            except ValueError:
+                # Битая строка не должна навсегда остановить чтение файла: она пропускается, прочие игры учитываются.
+                self.ingest(self._valid_lines(text))
+            self._offset += complete
+            return True
+
+    def _valid_lines(self, text):
+        valid = []
+        for line in text.splitlines():
+            try:
+                games = parse_games(line)
+            except ValueError as e:
+                logger.warning('Пропущена строка результатов игр в %s: %r (%s)', self.path, line, e)
+                continue
+            if len(games[0]):
+                valid.append(line)
+        return '\n'.join(valid)
+
+    def ingest(self, text):
+        seasons, home, away, home_score, away_score = parse_games(text)
+        if not len(seasons):
+            return 0
+        home_won = home_score > away_score
+        for season in np.unique(seasons):
+            mask = seasons == season
+            table = self.seasons.get(int(season))
+            if table is None:
+                table = self.seasons[int(season)] = SeasonTable()
+            table.apply(home[mask], away[mask], home_won[mask])
+        self.games += len(seasons)
+        self._cache.clear()
+        return len(seasons)
+
+    def standings(self, catalog, season=None, group='conference'):
+        with self._lock:
+            if season is None:
+                season = max(self.seasons, default=None)
+            table = self.seasons.get(season)
+            if table is None:
+                return None
+            key = (catalog.version, season, group)
+            result = self._cache.get(key)
+            if result is None:
+                groups = catalog.by_conference if group == 'conference' else catalog.by_division
+                result = self._cache[key] = {
+                    'season': season,
+                    'group': group,
+                    'standings': {
+                        name: self._with_names(catalog, table.rank([team.id for team in teams]))
+                        for name, teams in sorted(groups.items())
+                    },
+                }
+            return result
+
+    @staticmethod
+    def _with_names(catalog, rows):
+        for row in rows:
+            row['name'] = catalog.get(row['team_id']).name
+        return rows
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    global _engine
+    engine = _engine
+    if engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = StandingsEngine(settings.GAMES_DATA_FILE)
+            engine = _engine
+    engine.maybe_refresh(settings.STANDINGS_REFRESH_INTERVAL)
+    return engine
+
+
+def get_standings(season=None, group='conference'):
+    return get_engine().standings(get_catalog(), season, group)
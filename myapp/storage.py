@@ -0,0 +1,44 @@
+import gzip
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.json', '.svg', '.txt', '.html', '.map')
+MIN_COMPRESS_SIZE = 256
+
+
+class PrecompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    manifest_strict = False
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+        for name in sorted(set(self.hashed_files.values())):
+            if not name.endswith(COMPRESSIBLE_EXTENSIONS):
+                continue
+            compressed_name = self.compress(name)
+            if compressed_name:
+                yield name, compressed_name, True
+
+    def compress(self, name):
+        with self.open(name) as original:
+            content = original.read()
+        if len(content) < MIN_COMPRESS_SIZE:
+            return None
+        # mtime=0 — одинаковый вход даёт побайтно одинаковый .gz между сборками.
+        compressed = gzip.compress(content, compresslevel=9, mtime=0)
+        if len(compressed) >= len(content):
+            return None
+        compressed_name = name + '.gz'
+        if self.exists(compressed_name):
+            self.delete(compressed_name)
+        self._save(compressed_name, ContentFile(compressed))
+        return compressed_name
+
+    def stored_name(self, name):
+        # Без collectstatic манифеста нет — отдаём исходное имя вместо ошибки рендеринга.
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            return name
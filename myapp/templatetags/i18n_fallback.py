@@ -1,4 +1,8 @@
+from collections import namedtuple
+from types import MappingProxyType
+
 from django import template
+from django.conf import settings
 from django.utils.safestring import mark_safe
 from django.utils import translation
 
@@ -63,6 +67,13 @@ TRANSLATIONS = {
         'Share Team': 'Поделиться командой',
         'View All Teams': 'Показать все команды',
         'Print Info': 'Печать информации',
+        'Standings': 'Турнирная таблица',
+        'Team': 'Команда',
+        'W': 'В',
+        'L': 'П',
+        'Win %': '% побед',
+        'GB': 'Отст.',
+        'Streak': 'Серия',
 
         'Close': 'Закрыть',
         'Team Info': 'Информация о команде',
@@ -89,43 +100,113 @@ TRANSLATIONS = {
     }
 }
 
+PLURAL_TRANSLATIONS = {
+    'en': {
+        'You have {count} favorite team': {
+            'one': 'You have {count} favorite team',
+            'other': 'You have {count} favorite teams',
+        },
+        '{count} Championship': {
+            'one': '{count} Championship',
+            'other': '{count} Championships',
+        },
+    },
+    'ru': {
+        'You have {count} favorite team': {
+            'one': 'У вас {count} избранная команда',
+            'few': 'У вас {count} избранные команды',
+            'many': 'У вас {count} избранных команд',
+            'other': 'У вас {count} избранные команды',
+        },
+        '{count} Championship': {
+            'one': '{count} чемпионство',
+            'few': '{count} чемпионства',
+            'many': '{count} чемпионств',
+            'other': '{count} чемпионства',
+        },
+    },
+}
+
+
+def _english_plural(n):
+    return 'one' if n == 1 else 'other'
+
+
+def _russian_plural(n):
+    if n != int(n):
+        return 'other'
+    n = abs(int(n))
+    if n % 10 == 1 and n % 100 != 11:
+        return 'one'
+    if 2 <= n % 10 <= 4 and not 12 <= n % 100 <= 14:
+        return 'few'
+    return 'many'
+
+
+PLURAL_RULES = {
+    'en': _english_plural,
+    'ru': _russian_plural,
+}
+
+LanguageCatalog = namedtuple('LanguageCatalog', ('language', 'messages', 'plurals', 'plural_rule'))
+
+
+def _compile_catalog(language):
+    messages = {message: mark_safe(text) for message, text in TRANSLATIONS.get(language, {}).items()}
+    plurals = {
+        message: MappingProxyType(dict(forms))
+        for message, forms in PLURAL_TRANSLATIONS.get(language, PLURAL_TRANSLATIONS['en']).items()
+    }
+    return LanguageCatalog(
+        language,
+        MappingProxyType(messages),
+        MappingProxyType(plurals),
+        PLURAL_RULES.get(language, _english_plural),
+    )
+
+
+CATALOGS = MappingProxyType({code: _compile_catalog(code) for code, name in settings.LANGUAGES})
+DEFAULT_CATALOG = CATALOGS.get(settings.LANGUAGE_CODE) or _compile_catalog(settings.LANGUAGE_CODE)
+
+_CATALOG_KEY = 'i18n_fallback.catalog'
+
+
+def get_catalog(language):
+    if language in CATALOGS:
+        return CATALOGS[language]
+    if language:
+        return CATALOGS.get(language.split('-')[0], DEFAULT_CATALOG)
+    return DEFAULT_CATALOG
+
+
+def _active_catalog(context):
+    render_context = context.render_context
+    catalog = render_context.get(_CATALOG_KEY)
+    if catalog is None:
+        catalog = render_context[_CATALOG_KEY] = get_catalog(translation.get_language())
+    return catalog
+
+
 @register.simple_tag(takes_context=True)
 def trans(context, message):
-    current_language = translation.get_language()
-    lang_translations = TRANSLATIONS.get(current_language, {})
-    return mark_safe(lang_translations.get(message, message))
+    text = _active_catalog(context).messages.get(message)
+    return text if text is not None else mark_safe(message)
+
 
 @register.simple_tag(takes_context=True)
 def blocktrans(context, message, count=None, **kwargs):
-    current_language = translation.get_language()
-    
-    if current_language == 'ru' and count is not None:
-        if 'favorite team' in message.lower():
-            if count == 1:
-                return mark_safe(f"У вас {count} избранная команда")
-            elif 2 <= count <= 4:
-                return mark_safe(f"У вас {count} избранные команды") 
-            else:
-                return mark_safe(f"У вас {count} избранных команд")
-        elif 'Championship' in message:
-            if count == 1:
-                return mark_safe(f"{count} чемпионство")
-            elif 2 <= count <= 4:
-                return mark_safe(f"{count} чемпионства")
-            else:
-                return mark_safe(f"{count} чемпионств")
-    
+    catalog = _active_catalog(context)
     if count is not None:
-        if 'favorite team' in message.lower():
-            if count == 1:
-                return mark_safe(f"You have {count} favorite team")
-            else:
-                return mark_safe(f"You have {count} favorite teams")
-        elif 'Championship' in message:
-            if count == 1:
-                return mark_safe(f"{count} Championship")
-            else:
-                return mark_safe(f"{count} Championships")
-    
-    lang_translations = TRANSLATIONS.get(current_language, {})
-    return mark_safe(lang_translations.get(message, message))
\ No newline at end of file
+        # С count шаблон передаёт ключ из PLURAL_TRANSLATIONS, например 'You have {count} favorite team'.
+        forms = catalog.plurals.get(message)
+        if forms is None:
+            raise template.TemplateSyntaxError(f'blocktrans: нет форм множественного числа для {message!r}')
+        try:
+            count = int(count)
+        except (TypeError, ValueError):
+            raise template.TemplateSyntaxError(f'blocktrans: count должен быть целым числом, получено {count!r}')
+        form = forms.get(catalog.plural_rule(count)) or forms['other']
+        return mark_safe(form.format(count=count))
+
+    text = catalog.messages.get(message)
+    return text if text is not None else mark_safe(message)
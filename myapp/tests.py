@@ -0,0 +1,185 @@
+import base64
+import json
+import tempfile
+from pathlib import Path
+
+from django.test import RequestFactory, SimpleTestCase
+
+from .admission import TokenBuckets
+from .assets import accepts_gzip
+from .models import get_catalog
+from .pagination import InvalidCursor, decode_cursor, encode_cursor, parse_limit
+from .preferences import FAVORITES_FORMAT, MAX_VARINT_BYTES, decode_favorites, encode_favorites
+from .profiles import ProfileStore, new_profile_id
+from .templatetags.i18n_fallback import _russian_plural
+
+
+def _raw_favorites(payload):
+    return FAVORITES_FORMAT + base64.urlsafe_b64encode(bytes(payload)).rstrip(b'=').decode('ascii')
+
+
+class AcceptsGzipTests(SimpleTestCase):
+    def test_accept_encoding(self):
+        cases = {
+            '': False,
+            'gzip': True,
+            'br, gzip;q=0.5': True,
+            'gzip;q=0': False,
+            'gzip;q=0.000': False,
+            '*': True,
+            '*;q=0': False,
+            '*;q=0, gzip': True,
+            'gzip;q=0, *': False,
+            'identity': False,
+        }
+        for header, expected in cases.items():
+            with self.subTest(header=header):
+                request = RequestFactory().get('/', headers={'Accept-Encoding': header})
+                self.assertIs(accepts_gzip(request), expected)
+
+
+class FavoritesCookieTests(SimpleTestCase):
+    def setUp(self):
+        self.team_ids = sorted(get_catalog().by_id)
+
+    def test_round_trip(self):
+        favorites = frozenset(self.team_ids[::2])
+        self.assertEqual(decode_favorites(encode_favorites(favorites)), favorites)
+
+    def test_empty(self):
+        self.assertEqual(decode_favorites(''), frozenset())
+        self.assertEqual(decode_favorites(encode_favorites([])), frozenset())
+
+    def test_unknown_ids_are_dropped(self):
+        unknown = max(self.team_ids) + 1000
+        self.assertEqual(decode_favorites(encode_favorites([self.team_ids[0], unknown])), {self.team_ids[0]})
+
+    def test_overlong_varint_is_rejected(self):
+        payload = [0x81] * MAX_VARINT_BYTES + [0x01]
+        self.assertEqual(decode_favorites(_raw_favorites(payload)), frozenset())
+
+    def test_oversized_payload_is_rejected(self):
+        payload = [0x01] * (len(self.team_ids) * MAX_VARINT_BYTES + 1)
+        self.assertEqual(decode_favorites(_raw_favorites(payload)), frozenset())
+
+    def test_invalid_base64(self):
+        self.assertEqual(decode_favorites(FAVORITES_FORMAT + '!!!'), frozenset())
+
+    def test_legacy_json_list(self):
+        unknown = max(self.team_ids) + 1
+        value = json.dumps([self.team_ids[0], self.team_ids[1], unknown, 'x'])
+        self.assertEqual(decode_favorites(value), {self.team_ids[0], self.team_ids[1]})
+
+
+class RussianPluralTests(SimpleTestCase):
+    def test_forms(self):
+        cases = {
+            0: 'many', 1: 'one', 2: 'few', 4: 'few', 5: 'many', 11: 'many', 12: 'many', 14: 'many',
+            21: 'one', 22: 'few', 25: 'many', 101: 'one', 111: 'many', 112: 'many',
+        }
+        for count, form in cases.items():
+            with self.subTest(count=count):
+                self.assertEqual(_russian_plural(count), form)
+
+    def test_fraction(self):
+        self.assertEqual(_russian_plural(1.5), 'other')
+
+
+class CursorTests(SimpleTestCase):
+    def test_round_trip(self):
+        self.assertEqual(decode_cursor(encode_cursor('v1', 40), 'v1'), 40)
+
+    def test_stale_version(self):
+        with self.assertRaises(InvalidCursor):
+            decode_cursor(encode_cursor('v1', 40), 'v2')
+
+    def test_negative_offset(self):
+        with self.assertRaises(InvalidCursor):
+            decode_cursor(encode_cursor('v1', -1), 'v1')
+
+    def test_garbage(self):
+        for cursor in ('', '!!!', 'bm90LWEtY3Vyc29y', encode_cursor('v1', 'x')):
+            with self.subTest(cursor=cursor), self.assertRaises(InvalidCursor):
+                decode_cursor(cursor, 'v1')
+
+    def test_limit(self):
+        self.assertEqual(parse_limit(None, 20, 100), 20)
+        self.assertEqual(parse_limit('5', 20, 100), 5)
+        self.assertEqual(parse_limit('500', 20, 100), 100)
+        for value in ('0', '-1', 'abc'):
+            with self.subTest(value=value), self.assertRaises(InvalidCursor):
+                parse_limit(value, 20, 100)
+
+
+class TokenBucketsTests(SimpleTestCase):
+    def test_burst_then_retry_after(self):
+        buckets = TokenBuckets(rate=2.0, burst=2, maxsize=10)
+        self.assertEqual(buckets.take('a', 0.0), 0.0)
+        self.assertEqual(buckets.take('a', 0.0), 0.0)
+        self.assertAlmostEqual(buckets.take('a', 0.0), 0.5)
+        self.assertEqual(buckets.take('b', 0.0), 0.0)
+
+    def test_refill(self):
+        buckets = TokenBuckets(rate=2.0, burst=2, maxsize=10)
+        for _ in range(2):
+            buckets.take('a', 0.0)
+        self.assertEqual(buckets.take('a', 0.5), 0.0)
+        self.assertGreater(buckets.take('a', 0.5), 0.0)
+
+    def test_refill_is_capped_at_burst(self):
+        buckets = TokenBuckets(rate=2.0, burst=2, maxsize=10)
+        buckets.take('a', 0.0)
+        results = [buckets.take('a', 1000.0) for _ in range(3)]
+        self.assertEqual(results[:2], [0.0, 0.0])
+        self.assertGreater(results[2], 0.0)
+
+    def test_oldest_client_is_evicted(self):
+        buckets = TokenBuckets(rate=1.0, burst=1, maxsize=2)
+        buckets.take('a', 0.0)
+        buckets.take('b', 0.0)
+        buckets.take('c', 0.0)
+        self.assertEqual(len(buckets), 2)
+        self.assertEqual(buckets.take('a', 0.0), 0.0)
+
+
+class ProfileStoreTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name) / 'profiles.sqlite3'
+
+    def _store(self, **kwargs):
+        store = ProfileStore(self.path, flush_interval=60, **kwargs)
+        self.addCleanup(store.close)
+        return store
+
+    def _saved(self, profile_id):
+        return self._store(cache_size=1).get(profile_id)
+
+    def test_updates_are_coalesced(self):
+        store = self._store()
+        profile_id = new_profile_id()
+        for team_id in (1, 2, 3, 2):
+            store.update(profile_id, lambda favorites, team_id=team_id: favorites ^ {team_id})
+        self.assertEqual(store.get(profile_id), {1, 3})
+        self.assertEqual(store.flush(), 1)
+        self.assertEqual(self._saved(profile_id), {1, 3})
+
+    def test_processes_do_not_overwrite_each_other(self):
+        first, second = self._store(), self._store()
+        profile_id = new_profile_id()
+        self.assertEqual(second.get(profile_id), frozenset())
+        first.update(profile_id, lambda favorites: favorites | {1})
+        first.flush()
+        second.update(profile_id, lambda favorites: favorites | {2})
+        second.flush()
+        self.assertEqual(self._saved(profile_id), {1, 2})
+        self.assertEqual(second.get(profile_id), {1, 2})
+
+    def test_cache_expires(self):
+        first, second = self._store(), self._store(cache_ttl=0)
+        profile_id = new_profile_id()
+        second.get(profile_id)
+        first.set(profile_id, {3})
+        first.flush()
+        self.assertEqual(second.get(profile_id), {3})
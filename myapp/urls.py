@@ -3,8 +3,14 @@ from . import views
 
 urlpatterns = [
     path('', views.home, name='home'),
+    path('teams/search/', views.team_search, name='team_search'),
+    path('teams/<int:team_id>/', views.team_detail, name='team_detail'),
+    path('standings/', views.standings, name='standings'),
     path('preferences/', views.preferences, name='preferences'),
+    path('preferences/batch/', views.preferences_batch, name='preferences_batch'),
     path('toggle-favorite/', views.toggle_favorite, name='toggle_favorite'),
     path('change-language/', views.change_language, name='change_language'),
     path('change-theme/', views.change_theme, name='change_theme'),
+    path('events/', views.events, name='events'),
+    path('metrics', views.metrics, name='metrics'),
 ]
\ No newline at end of file
@@ -1,28 +1,116 @@
 from django.shortcuts import render, redirect
-from django.http import JsonResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.cache import cache_control
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import condition, require_GET
+from django.views.decorators.vary import vary_on_cookie, vary_on_headers
+from django.conf import settings
+import hashlib
 import json
-from .models import get_all_teams, LANGUAGE_CHOICES, THEME_CHOICES
+import time
+from .models import get_catalog, LANGUAGE_CHOICES, THEME_CHOICES
 from .forms import SearchForm
+from .events import hub, stream_events
+from .fragments import InvalidFields, cache_stats, get_team_serializer, parse_fields, render_team_grid, serialize_team_search
+from .metrics import registry
+from .pagination import InvalidCursor, aiter_json_array, decode_cursor, encode_cursor, iter_json_array, parse_limit
+from .standings import STANDINGS_GROUPS, get_engine, get_standings
+from .preferences import (
+    FAVORITES_COOKIE, LANGUAGE_COOKIE, PROFILE_COOKIE, THEME_COOKIE, encode_favorites, is_team_id,
+    set_preference_cookie,
+)
 
+PREFERENCE_COOKIES = (LANGUAGE_COOKIE, THEME_COOKIE, FAVORITES_COOKIE, PROFILE_COOKIE, settings.CSRF_COOKIE_NAME)
+
+
+def _template_digest():
+    digest = hashlib.blake2b(digest_size=8)
+    for path in sorted(settings.BASE_DIR.joinpath('templates').glob('*.html')):
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+TEMPLATES_VERSION = _template_digest()
+
+
+def _preferences_etag(request, *parts):
+    digest = hashlib.blake2b(digest_size=16)
+    for part in (TEMPLATES_VERSION, get_catalog().version, *parts):
+        digest.update(str(part).encode())
+        digest.update(b'\0')
+    for name in PREFERENCE_COOKIES:
+        digest.update(request.COOKIES.get(name, '').encode())
+        digest.update(b'\0')
+    if request.preferences.profile_id:
+        # Избранное профиля меняется без смены cookie, поэтому в ETag входит само избранное.
+        digest.update(encode_favorites(request.preferences.favorites).encode())
+    return digest.hexdigest()
+
+
+def home_etag(request):
+    return _preferences_etag(
+        request, 'home', get_engine().version, request.headers.get('X-Requested-With', ''), request.GET.urlencode()
+    )
+
+
+def team_search_etag(request):
+    return _preferences_etag(request, 'team_search', request.GET.urlencode())
+
+
+def preferences_etag(request):
+    return _preferences_etag(request, 'preferences')
+
+
+def _team_detail_language(request):
+    language = request.GET.get('lang')
+    return language if any(lang[0] == language for lang in LANGUAGE_CHOICES) else None
+
+
+def team_detail_etag(request, team_id):
+    detail = get_catalog().detail(team_id, _team_detail_language(request) or request.preferences.language)
+    return detail[0] if detail else None
+
+
+def standings_etag(request):
+    digest = hashlib.blake2b(digest_size=16)
+    for part in ('standings', get_engine().version, get_catalog().version, request.GET.urlencode()):
+        digest.update(str(part).encode())
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def catalog_last_modified(request):
+    return get_catalog().loaded_at
+
+
+def render_page(request, template_name, context):
+    started = time.perf_counter()
+    response = render(request, template_name, context)
+    registry.record_template_render(template_name, time.perf_counter() - started)
+    return response
+
+
+def _fragment_cache_metrics():
+    lines = []
+    for name, kind in (('hits', 'counter'), ('misses', 'counter'), ('evictions', 'counter'), ('size', 'gauge')):
+        metric = f'myapp_fragment_cache_{name}' + ('_total' if kind == 'counter' else '')
+        lines.append(f'# TYPE {metric} {kind}')
+        for cache, stats in cache_stats().items():
+            lines.append(f'{metric}{{cache="{cache}"}} {stats[name]}')
+    return lines
+
+
+registry.add_collector(_fragment_cache_metrics)
+
+
+@cache_control(private=True, no_cache=True)
+@vary_on_headers('Cookie', 'X-Requested-With')
+@condition(etag_func=home_etag, last_modified_func=catalog_last_modified)
 def home(request):
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest' and request.method == 'GET':
-        search_term = request.GET.get('search', '')
-        teams = get_all_teams()
-        
-        if search_term:
-            teams = [team for team in teams if search_term.lower() in team['name'].lower() or search_term.lower() in team['city'].lower()]
-        
-        favorites = request.COOKIES.get('favorite_teams', '[]')
-        try:
-            favorite_list = json.loads(favorites)
-        except (json.JSONDecodeError, TypeError):
-            favorite_list = []
-        
-        for team in teams:
-            team['is_favorite'] = team['id'] in favorite_list
-        
-        return JsonResponse({'teams': teams})
+        return _legacy_team_search_response(request)
     
     search_term = ''
     if request.method == 'GET':
@@ -30,63 +118,167 @@ def home(request):
         if form.is_valid():
             search_term = form.cleaned_data['search']
     
-    teams = get_all_teams()
+    catalog = get_catalog()
+    teams = catalog.search(search_term)
+    favorite_ids = request.preferences.favorites
+    
+    context = {
+        'team_cards': render_team_grid(catalog, teams, favorite_ids, search_term),
+        'favorite_count': len(favorite_ids),
+        'search_form': SearchForm(initial={'search': search_term}),
+        'standings': get_standings()
+    }
+    return render_page(request, 'home.html', context)
+
+def _legacy_team_search_response(request):
+    # Прежний формат для старых клиентов: флаг is_favorite в каждой команде, без fields= и кеша тел.
+    catalog = get_catalog()
+    teams = catalog.search(request.GET.get('search', ''))
+    favorite_ids = request.preferences.favorites
+    
+    def serialize(team):
+        return team.to_dict(team.id in favorite_ids)
+    
+    if request.GET.get('stream'):
+        stream = aiter_json_array if isinstance(request, ASGIRequest) else iter_json_array
+        return StreamingHttpResponse(stream('teams', teams, serialize), content_type='application/json')
     
-    if search_term:
-        teams = [team for team in teams if search_term.lower() in team['name'].lower() or search_term.lower() in team['city'].lower()]
+    if 'limit' not in request.GET and 'cursor' not in request.GET:
+        return JsonResponse({'teams': [serialize(team) for team in teams]})
     
-    favorites = request.COOKIES.get('favorite_teams', '[]')
     try:
-        favorite_list = json.loads(favorites)
-    except (json.JSONDecodeError, TypeError):
-        favorite_list = []
+        limit = parse_limit(request.GET.get('limit'), settings.TEAMS_PAGE_SIZE, settings.TEAMS_MAX_PAGE_SIZE)
+        cursor = request.GET.get('cursor')
+        offset = decode_cursor(cursor, catalog.version) if cursor else 0
+    except InvalidCursor as e:
+        return JsonResponse({'error': str(e)}, status=400)
     
-    for team in teams:
-        team['is_favorite'] = team['id'] in favorite_list
+    end = offset + limit
+    return JsonResponse({
+        'teams': [serialize(team) for team in teams[offset:end]],
+        'next_cursor': encode_cursor(catalog.version, end) if end < len(teams) else None,
+        'total': len(teams)
+    })
+
+def _team_search_response(request):
+    catalog = get_catalog()
+    search_term = request.GET.get('search', '')
+    favorite_ids = request.preferences.favorites
     
-    context = {
-        'teams': teams,
-        'favorite_count': len(favorite_list),
-        'search_form': SearchForm(initial={'search': search_term})
-    }
-    return render(request, 'home.html', context)
+    try:
+        fields = parse_fields(request.GET.get('fields'))
+    except InvalidFields as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    response_format = request.GET.get('format', 'objects')
+    if response_format not in ('objects', 'compact'):
+        return JsonResponse({'error': 'Неверный формат ответа'}, status=400)
+    compact = response_format == 'compact'
+    
+    if request.GET.get('stream'):
+        if compact:
+            return JsonResponse({'error': 'Потоковый ответ поддерживает только формат objects'}, status=400)
+        serializer = get_team_serializer(catalog, fields)
+        teams = catalog.search(search_term)
+        # Избранное, как и в обычном ответе, — отдельным списком id после массива команд.
+        favorites = [team.id for team in teams if team.id in favorite_ids]
+        stream = aiter_json_array if isinstance(request, ASGIRequest) else iter_json_array
+        return StreamingHttpResponse(
+            stream('teams', teams, serializer.object, trailer={'favorites': favorites}, encoded=True),
+            content_type='application/json'
+        )
+    
+    offset = limit = None
+    if 'limit' in request.GET or 'cursor' in request.GET:
+        try:
+            limit = parse_limit(request.GET.get('limit'), settings.TEAMS_PAGE_SIZE, settings.TEAMS_MAX_PAGE_SIZE)
+            cursor = request.GET.get('cursor')
+            offset = decode_cursor(cursor, catalog.version) if cursor else 0
+        except InvalidCursor as e:
+            return JsonResponse({'error': str(e)}, status=400)
+    
+    head, team_ids = serialize_team_search(catalog, search_term, offset, limit, fields, compact)
+    favorites = [team_id for team_id in team_ids if team_id in favorite_ids]
+    return HttpResponse(head + b',"favorites":' + json.dumps(favorites).encode() + b'}', content_type='application/json')
+
+
+@cache_control(private=True, no_cache=True)
+@vary_on_cookie
+@require_GET
+@condition(etag_func=team_search_etag, last_modified_func=catalog_last_modified)
+async def team_search(request):
+    return _team_search_response(request)
+
+
+@require_GET
+@condition(etag_func=team_detail_etag)
+async def team_detail(request, team_id):
+    language = _team_detail_language(request)
+    detail = get_catalog().detail(team_id, language or request.preferences.language)
+    if detail is None:
+        return JsonResponse({'error': 'Команда не найдена'}, status=404)
+    
+    response = HttpResponse(detail[1], content_type='application/json')
+    if language:
+        # С явным ?lang= ответ не зависит от cookie и может храниться в общих кешах.
+        patch_cache_control(response, public=True, max_age=settings.TEAM_DETAIL_MAX_AGE)
+    else:
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ('Cookie',))
+    return response
+
+
+@cache_control(public=True, no_cache=True)
+@require_GET
+@condition(etag_func=standings_etag)
+def standings(request):
+    group = request.GET.get('group', 'conference')
+    if group not in STANDINGS_GROUPS:
+        return JsonResponse({'error': 'Неверная группировка'}, status=400)
+    
+    season = request.GET.get('season')
+    if season:
+        try:
+            season = int(season)
+        except ValueError:
+            return JsonResponse({'error': 'Неверный сезон'}, status=400)
+    
+    result = get_standings(season or None, group)
+    if result is None:
+        return JsonResponse({'error': 'Нет результатов игр за этот сезон'}, status=404)
+    
+    return JsonResponse({**result, 'seasons': sorted(get_engine().seasons)})
 
+
+@cache_control(private=True, no_cache=True)
+@vary_on_cookie
+@condition(etag_func=preferences_etag, last_modified_func=catalog_last_modified)
 def preferences(request):
     if request.method == 'POST':
         response = redirect('home')
         
         language = request.POST.get('language')
         if language and any(lang[0] == language for lang in LANGUAGE_CHOICES):
-            response.set_cookie('django_language', language, max_age=365*24*60*60, path='/')
+            set_preference_cookie(response, LANGUAGE_COOKIE, language)
         
         theme = request.POST.get('theme')
         if theme and any(t[0] == theme for t in THEME_CHOICES):
-            response.set_cookie('theme', theme, max_age=365*24*60*60, path='/')
+            set_preference_cookie(response, THEME_COOKIE, theme)
         
         return response
     
-    current_language = getattr(request, 'LANGUAGE_CODE', None)
-    if not current_language:
-        current_language = request.COOKIES.get('django_language', 'en')
-    current_theme = getattr(request, 'theme', request.COOKIES.get('theme', 'light'))
-    
-    favorites = request.COOKIES.get('favorite_teams', '[]')
-    try:
-        favorite_list = json.loads(favorites)
-    except (json.JSONDecodeError, TypeError):
-        favorite_list = []
+    preferences = request.preferences
     
     context = {
         'language_choices': LANGUAGE_CHOICES,
         'theme_choices': THEME_CHOICES,
-        'current_language': current_language,
-        'current_theme': current_theme,
-        'favorite_count': len(favorite_list)
+        'current_language': preferences.language,
+        'current_theme': preferences.theme,
+        'favorite_count': len(preferences.favorites)
     }
-    return render(request, 'preferences.html', context)
+    return render_page(request, 'preferences.html', context)
 
 @csrf_exempt
-def toggle_favorite(request):
+async def toggle_favorite(request):
     if request.method == 'POST':
         try:
             data = json.loads(request.body)
@@ -95,34 +287,17 @@ def toggle_favorite(request):
             if not team_id:
                 return JsonResponse({'error': 'Требуется ID команды'}, status=400)
             
-            favorites = request.COOKIES.get('favorite_teams', '[]')
-            try:
-                favorite_list = json.loads(favorites)
-            except (json.JSONDecodeError, TypeError):
-                favorite_list = []
+            if not is_team_id(team_id):
+                return JsonResponse({'error': 'Неверный ID команды'}, status=400)
             
-            if team_id in favorite_list:
-                favorite_list.remove(team_id)
-                is_favorite = False
-            else:
-                favorite_list.append(team_id)
-                is_favorite = True
+            favorites = await request.preferences.asave_favorites(lambda favorites: favorites ^ {team_id})
             
-            response = JsonResponse({
+            return JsonResponse({
                 'success': True,
-                'is_favorite': is_favorite,
-                'favorite_count': len(favorite_list)
+                'is_favorite': team_id in favorites,
+                'favorite_count': len(favorites)
             })
             
-            response.set_cookie(
-                'favorite_teams', 
-                json.dumps(favorite_list), 
-                max_age=365*24*60*60,
-                path='/'
-            )
-            
-            return response
-            
         except json.JSONDecodeError:
             return JsonResponse({'error': 'Неверный JSON'}, status=400)
         except Exception as e:
@@ -131,7 +306,7 @@ def toggle_favorite(request):
     return JsonResponse({'error': 'Требуется метод POST'}, status=405)
 
 @csrf_exempt
-def change_theme(request):
+async def change_theme(request):
     if request.method == 'POST':
         try:
             data = json.loads(request.body)
@@ -149,12 +324,7 @@ def change_theme(request):
                 'message': 'Тема успешно обновлена'
             })
             
-            response.set_cookie(
-                'theme', 
-                theme, 
-                max_age=365*24*60*60,
-                path='/'
-            )
+            set_preference_cookie(response, THEME_COOKIE, theme)
             
             return response
             
@@ -166,7 +336,7 @@ def change_theme(request):
     return JsonResponse({'error': 'Требуется метод POST'}, status=405)
 
 @csrf_exempt
-def change_language(request):
+async def change_language(request):
     if request.method == 'POST':
         try:
             data = json.loads(request.body)
@@ -184,12 +354,7 @@ def change_language(request):
                 'message': 'Язык успешно обновлен'
             })
             
-            response.set_cookie(
-                'django_language', 
-                language, 
-                max_age=365*24*60*60,
-                path='/'
-            )
+            set_preference_cookie(response, LANGUAGE_COOKIE, language)
             
             return response
             
@@ -199,3 +364,138 @@ def change_language(request):
             return JsonResponse({'error': str(e)}, status=500)
     
     return JsonResponse({'error': 'Требуется метод POST'}, status=405)
+
+MAX_BATCH_OPERATIONS = 100
+
+
+def _apply_batch_operation(state, operation):
+    if not isinstance(operation, dict):
+        return 'Операция должна быть объектом'
+    
+    op = operation.get('op')
+    if op in ('add_favorite', 'remove_favorite'):
+        team_id = operation.get('team_id')
+        if not is_team_id(team_id):
+            return 'Неверный ID команды'
+        if op == 'add_favorite':
+            state['favorites'].add(team_id)
+        else:
+            state['favorites'].discard(team_id)
+        state['changed'].add(FAVORITES_COOKIE)
+    elif op == 'set_favorites':
+        team_ids = operation.get('team_ids')
+        if not isinstance(team_ids, list) or not all(is_team_id(team_id) for team_id in team_ids):
+            return 'Неверный список команд'
+        state['favorites'] = set(team_ids)
+        state['changed'].add(FAVORITES_COOKIE)
+    elif op == 'set_theme':
+        theme = operation.get('theme')
+        if not any(t[0] == theme for t in THEME_CHOICES):
+            return 'Неверная тема'
+        state['theme'] = theme
+        state['changed'].add(THEME_COOKIE)
+    elif op == 'set_language':
+        language = operation.get('language')
+        if not any(lang[0] == language for lang in LANGUAGE_CHOICES):
+            return 'Неверный язык'
+        state['language'] = language
+        state['changed'].add(LANGUAGE_COOKIE)
+    else:
+        return 'Неизвестная операция'
+    return None
+
+def _replay_favorite_operations(favorites, operations):
+    # Хранилище профилей применяет изменение к версии из базы: операции повторяются на ней,
+    # а не подменяют её избранным, посчитанным по версии этого процесса.
+    state = {'favorites': set(favorites), 'theme': None, 'language': None, 'changed': set()}
+    for operation in operations:
+        _apply_batch_operation(state, operation)
+    return state['favorites']
+
+@csrf_exempt
+async def preferences_batch(request):
+    if request.method == 'POST':
+        try:
+            data = json.loads(request.body)
+            operations = data.get('operations') if isinstance(data, dict) else None
+            
+            if not isinstance(operations, list) or not operations:
+                return JsonResponse({'error': 'Требуется список операций'}, status=400)
+            
+            if len(operations) > MAX_BATCH_OPERATIONS:
+                return JsonResponse({'error': 'Слишком много операций'}, status=400)
+            
+            preferences = request.preferences
+            state = {
+                'favorites': set(preferences.favorites),
+                'theme': preferences.theme,
+                'language': preferences.language,
+                'changed': set(),
+            }
+            for index, operation in enumerate(operations):
+                error = _apply_batch_operation(state, operation)
+                if error:
+                    return JsonResponse({'error': error, 'index': index}, status=400)
+            
+            response = JsonResponse({
+                'success': True,
+                'favorites': sorted(state['favorites']),
+                'favorite_count': len(state['favorites']),
+                'theme': state['theme'],
+                'language': state['language']
+            })
+            
+            changed = state['changed']
+            if FAVORITES_COOKIE in changed and state['favorites'] != preferences.favorites:
+                await preferences.asave_favorites(lambda favorites: _replay_favorite_operations(favorites, operations))
+            if THEME_COOKIE in changed and state['theme'] != request.COOKIES.get(THEME_COOKIE):
+                set_preference_cookie(response, THEME_COOKIE, state['theme'])
+            if LANGUAGE_COOKIE in changed and state['language'] != request.COOKIES.get(LANGUAGE_COOKIE):
+                set_preference_cookie(response, LANGUAGE_COOKIE, state['language'])
+            
+            return response
+            
+        except json.JSONDecodeError:
+            return JsonResponse({'error': 'Неверный JSON'}, status=400)
+        except Exception as e:
+            return JsonResponse({'error': str(e)}, status=500)
+    
+    return JsonResponse({'error': 'Требуется метод POST'}, status=405)
+
+
+def _event_team_ids(request):
+    teams = request.GET.get('teams', '')
+    if not teams:
+        return None
+    if teams == 'favorites':
+        return request.preferences.favorites
+    try:
+        team_ids = frozenset(int(team_id) for team_id in teams.split(','))
+    except ValueError:
+        raise ValueError('Неверный список команд')
+    if not all(is_team_id(team_id) for team_id in team_ids):
+        raise ValueError('Неверный список команд')
+    return team_ids
+
+
+@cache_control(no_store=True)
+@require_GET
+async def events(request):
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({'error': 'События доступны только через ASGI'}, status=501)
+    
+    try:
+        team_ids = _event_team_ids(request)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    await hub.ensure_listener()
+    response = StreamingHttpResponse(stream_events(team_ids), content_type='text/event-stream')
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@cache_control(no_store=True)
+@require_GET
+def metrics(request):
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,75 @@
+import logging
+import time
+
+from django.conf import settings
+from django.template.loader import get_template
+from django.test import RequestFactory
+from django.utils import translation
+
+from .models import THEME_CHOICES, get_catalog
+from .preferences import LANGUAGE_COOKIE, THEME_COOKIE, Preferences
+
+logger = logging.getLogger(__name__)
+
+WARMUP_TEMPLATES = ('base.html', 'home.html', 'preferences.html', 'team_card.html')
+
+
+def _build_catalog():
+    catalog = get_catalog()
+    for team in catalog.teams:
+        catalog.search(team.name[:3])
+    return f'{len(catalog)} команд, версия {catalog.version}'
+
+
+def _compile_translations():
+    from .templatetags.i18n_fallback import CATALOGS
+    return ', '.join(sorted(CATALOGS))
+
+
+def _load_templates():
+    for name in WARMUP_TEMPLATES:
+        get_template(name)
+    return f'{len(WARMUP_TEMPLATES)} шаблонов'
+
+
+def _render_pages():
+    from . import views
+
+    factory = RequestFactory()
+    rendered = 0
+    for language, language_name in settings.LANGUAGES:
+        for theme, theme_name in THEME_CHOICES:
+            for path, view in (('/', views.home), ('/preferences/', views.preferences)):
+                request = factory.get(path)
+                request.COOKIES = {LANGUAGE_COOKIE: language, THEME_COOKIE: theme}
+                request.preferences = Preferences(request)
+                with translation.override(language):
+                    view(request)
+                rendered += 1
+    return f'{rendered} страниц'
+
+
+WARMUP_STEPS = (
+    ('catalog', _build_catalog),
+    ('translations', _compile_translations),
+    ('templates', _load_templates),
+    ('pages', _render_pages),
+)
+
+
+def run_warmup():
+    report = []
+    for name, step in WARMUP_STEPS:
+        started = time.perf_counter()
+        detail = step()
+        elapsed = time.perf_counter() - started
+        logger.info('warmup %s: %.1f ms (%s)', name, elapsed * 1000, detail)
+        report.append((name, elapsed, detail))
+    return report
+
+
+def warmup_on_startup():
+    # Вызывается из точек входа сервера (wsgi.py, asgi.py), а не из AppConfig.ready():
+    # иначе прогрев шёл бы перед каждой management-командой, в том числе collectstatic до появления манифеста.
+    if getattr(settings, 'WARMUP_ON_STARTUP', False):
+        run_warmup()
@@ -19,6 +19,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'myapp.middleware.MetricsMiddleware',
+    'myapp.middleware.AdmissionMiddleware',
+    'myapp.middleware.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.locale.LocaleMiddleware',
@@ -28,6 +31,7 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'myapp.middleware.PreferencesMiddleware',
+    'myapp.middleware.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'myproject.urls'
@@ -96,4 +100,71 @@ STATICFILES_DIRS = [
 ]
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
-DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
\ No newline at end of file
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'myapp.storage.PrecompressedManifestStaticFilesStorage',
+    },
+}
+
+DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Прогрев при загрузке myproject.wsgi/asgi; management-команды его не запускают.
+WARMUP_ON_STARTUP = not DEBUG
+
+# Выборочное профилирование запросов cProfile; только синхронный (WSGI) путь.
+PROFILING_ENABLED = False
+PROFILING_SAMPLE_RATE = 0.0
+PROFILING_HEADER = 'X-Profile'
+PROFILING_DIR = BASE_DIR / 'profiles'
+PROFILING_MAX_FILES = 50
+
+TEAMS_DATA_FILE = BASE_DIR / 'data' / 'teams.jsonl'
+# Наблюдатель за файлом работает только в серверных процессах (wsgi.py, asgi.py, serve_prefork).
+TEAMS_DATA_RELOAD_INTERVAL = 2.0
+
+TEAMS_PAGE_SIZE = 50
+TEAMS_MAX_PAGE_SIZE = 500
+TEAM_DETAIL_MAX_AGE = 300
+
+TEAM_CARD_CACHE_SIZE = 4096
+TEAM_GRID_CACHE_SIZE = 512
+TEAM_SEARCH_CACHE_SIZE = 1024
+TEAM_SERIALIZER_CACHE_SIZE = 64
+
+EVENTS_QUEUE_SIZE = 32
+EVENTS_HEARTBEAT = 15
+EVENTS_RETRY_MS = 3000
+EVENTS_SOCKET_DIR = BASE_DIR / 'run'
+
+GAMES_DATA_FILE = BASE_DIR / 'data' / 'games.csv'
+STANDINGS_REFRESH_INTERVAL = 1.0
+
+# Сжатие динамических ответов; 0 отключает CompressionMiddleware.
+COMPRESSION_LEVEL = 6
+COMPRESSION_MIN_SIZE = 512
+COMPRESSION_CONTENT_TYPES = ('text/html', 'application/json', 'text/plain')
+COMPRESSION_CACHE_SIZE = 256
+
+# Серверное хранилище избранного (SQLite в режиме WAL); None — избранное живёт в cookie.
+PROFILE_STORE_PATH = None
+PROFILE_CACHE_SIZE = 10000
+PROFILE_FLUSH_INTERVAL = 0.05
+# Сколько секунд процесс верит своему кешу профиля, пока другие воркеры пишут в ту же базу.
+PROFILE_CACHE_TTL = 1.0
+
+# Контроль нагрузки: ограничение частоты записей на клиента и число одновременных запросов по классам.
+ADMISSION_CONTROL_ENABLED = True
+ADMISSION_WRITE_ROUTES = ('toggle_favorite', 'change_theme', 'change_language', 'preferences_batch')
+ADMISSION_WRITE_RATE = 5.0
+ADMISSION_WRITE_BURST = 20
+ADMISSION_CLIENT_TABLE_SIZE = 10000
+# Заголовок с адресом клиента от доверенного прокси, например 'HTTP_X_REAL_IP'; None — REMOTE_ADDR.
+ADMISSION_CLIENT_ADDRESS_HEADER = None
+ADMISSION_PAGE_MAX_IN_FLIGHT = 64
+ADMISSION_WRITE_MAX_IN_FLIGHT = 4
+ADMISSION_WRITE_YIELD_PAGES = 8
+ADMISSION_PAGE_MAX_QUEUE_TIME = 5.0
+ADMISSION_WRITE_MAX_QUEUE_TIME = 0.5
\ No newline at end of file
@@ -1,10 +1,26 @@
+from django.conf import settings
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.views.generic.base import RedirectView
 from django.templatetags.static import static
 
+
+class FaviconRedirectView(RedirectView):
+    # Имя файла с хешем меняется при каждой сборке статики: адрес вычисляется на запрос, а редирект временный.
+    permanent = False
+
+    def get_redirect_url(self, *args, **kwargs):
+        return static('images/favicon.png')
+
+
 urlpatterns = [
-    path('favicon.ico', RedirectView.as_view(url=static('images/favicon.png'), permanent=True)),
+    path('favicon.ico', FaviconRedirectView.as_view()),
     path('admin/', admin.site.urls),
     path('', include('myapp.urls')),
 ]
+
+if not settings.DEBUG:
+    # В DEBUG статику раздаёт runserver; иначе — собранные collectstatic файлы с .gz-вариантами.
+    from myapp.assets import serve_static
+
+    urlpatterns.append(re_path(r'^%s(?P<path>.+)$' % settings.STATIC_URL.lstrip('/'), serve_static))
@@ -14,3 +14,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'myproject.settings')
 
 application = get_wsgi_application()
+
+from myapp.loader import watch_catalog_on_startup  # noqa: E402
+from myapp.warmup import warmup_on_startup  # noqa: E402
+
+warmup_on_startup()
+watch_catalog_on_startup()
@@ -11,6 +11,7 @@ function initializeApp() {
     setupMobileViewport();
     setupOrientationChange();
     initializeSearch();
+    initializeLiveUpdates();
     
     const savedFilter = sessionStorage.getItem('nbaFilter');
     {
@@ -91,23 +92,19 @@ function setCookie(name, value, days = 365) {
     document.cookie = `${name}=${value}; expires=${expires.toUTCString()}; path=/`;
 }
 
-function toggleFavorite(teamId) {
-    const teamCard = document.querySelector(`[data-team-id="${teamId}"]`);
-    const favoriteBtn = teamCard ? teamCard.querySelector('.favorite-btn') : document.querySelector('.btn-favorite');
-    
-    if (favoriteBtn) {
-        favoriteBtn.disabled = true;
-        favoriteBtn.style.opacity = '0.6';
-    }
-    
-    fetch('/toggle-favorite/', {
+const BATCH_FLUSH_DELAY = 150;
+let pendingFavoriteOps = new Map();
+let batchFlushTimeout = null;
+
+function sendPreferenceBatch(operations) {
+    return fetch('/preferences/batch/', {
         method: 'POST',
         headers: {
             'Content-Type': 'application/json',
             'X-CSRFToken': window.csrfToken || getCookie('csrftoken')
         },
         body: JSON.stringify({
-            team_id: teamId
+            operations: operations
         })
     })
     .then(response => {
@@ -117,27 +114,58 @@ function toggleFavorite(teamId) {
         return response.json();
     })
     .then(data => {
-        if (data.success) {
-            console.log('Toggle favorite response:', data);
-            updateFavoriteUI(teamId, data.is_favorite, data.favorite_count);
-            setTimeout(() => {
-                const activeFilter = sessionStorage.getItem('nbaFilter') || 'favorites';
-                if (window.filterTeams && typeof window.filterTeams === 'function') {
-                    window.filterTeams(activeFilter);
-                }
-            }, 100);
-        } else {
+        if (!data.success) {
             throw new Error(data.error || 'Произошла неизвестная ошибка');
         }
+        return data;
+    });
+}
+
+function toggleFavorite(teamId) {
+    const teamCard = document.querySelector(`[data-team-id="${teamId}"]`);
+    const wasFavorite = teamCard ? teamCard.dataset.isFavorite === 'true' : pendingFavoriteOps.get(teamId) === 'add_favorite';
+    const isFavorite = !wasFavorite;
+    const counter = document.getElementById('favorites-count');
+    const currentCount = counter ? parseInt(counter.textContent, 10) || 0 : 0;
+    
+    updateFavoriteUI(teamId, isFavorite, Math.max(0, currentCount + (isFavorite ? 1 : -1)));
+    
+    pendingFavoriteOps.set(teamId, isFavorite ? 'add_favorite' : 'remove_favorite');
+    if (batchFlushTimeout) {
+        clearTimeout(batchFlushTimeout);
+    }
+    batchFlushTimeout = setTimeout(flushFavoriteOps, BATCH_FLUSH_DELAY);
+}
+
+function flushFavoriteOps() {
+    batchFlushTimeout = null;
+    const ops = pendingFavoriteOps;
+    pendingFavoriteOps = new Map();
+    if (ops.size === 0) {
+        return;
+    }
+    
+    const operations = Array.from(ops, ([teamId, op]) => ({op: op, team_id: teamId}));
+    
+    sendPreferenceBatch(operations)
+    .then(data => {
+        console.log('Batch favorites response:', data);
+        const favorites = new Set(data.favorites);
+        ops.forEach((op, teamId) => {
+            updateFavoriteUI(teamId, favorites.has(teamId), data.favorite_count);
+        });
+        if (liveUpdates) {
+            initializeLiveUpdates();
+        }
     })
     .catch(error => {
         console.error('Ошибка переключения избранного:', error);
-    })
-    .finally(() => {
-        if (favoriteBtn) {
-            favoriteBtn.disabled = false;
-            favoriteBtn.style.opacity = '1';
-        }
+        const counter = document.getElementById('favorites-count');
+        let count = counter ? parseInt(counter.textContent, 10) || 0 : 0;
+        ops.forEach((op, teamId) => {
+            count += op === 'add_favorite' ? -1 : 1;
+            updateFavoriteUI(teamId, op !== 'add_favorite', Math.max(0, count));
+        });
     });
 }
 
@@ -342,39 +370,6 @@ function initializeInteractivity() {
         });
     });
     
-    let lastTouchTime = 0;
-    document.querySelectorAll('.toggle-favorite-btn').forEach(btn => {
-        btn.addEventListener('click', function(e) {
-            if (isTouchDevice) {
-                const now = Date.now();
-                if (now - lastTouchTime < 500) {
-                    e.preventDefault();
-                    return;
-                }
-                lastTouchTime = now;
-            }
-            
-            const teamId = parseInt(this.dataset.teamId);
-            toggleFavorite(teamId);
-        });
-    });
-    
-    document.querySelectorAll('.team-info-btn').forEach(btn => {
-        btn.addEventListener('click', function(e) {
-            if (isTouchDevice) {
-                const now = Date.now();
-                if (now - lastTouchTime < 500) {
-                    e.preventDefault();
-                    return;
-                }
-                lastTouchTime = now;
-            }
-            
-            const teamId = parseInt(this.dataset.teamId);
-            showTeamInfo(teamId);
-        });
-    });
-    
     const modals = document.querySelectorAll('.modal');
     modals.forEach(modal => {
         if (isTouchDevice) {
@@ -527,9 +522,10 @@ function clearAllFavorites() {
     showConfirmModal(
         'Вы уверены, что хотите удалить все избранные команды? Это действие нельзя отменить.',
         function() {
-            setCookie('favorite_teams', '[]', 365);
-            console.log('Все избранные очищены');
-            location.reload();
+            sendPreferenceBatch([{op: 'set_favorites', team_ids: []}])
+            .then(() => console.log('Все избранные очищены'))
+            .catch(error => console.error('Ошибка очистки избранного:', error))
+            .finally(() => location.reload());
         }
     );
 }
@@ -538,14 +534,16 @@ function resetToDefaults() {
     showConfirmModal(
         'Сбросить все настройки к значениям по умолчанию? Это очистит ваш язык, тему и избранные команды.',
         function() {
-            setCookie('django_language', '', -1);
-            setCookie('theme', '', -1);
-            setCookie('favorite_teams', '[]', -1);
-            
             document.documentElement.setAttribute('data-theme', 'light');
             
-            console.log('Настройки сброшены к значениям по умолчанию');
-            location.reload();
+            sendPreferenceBatch([
+                {op: 'set_favorites', team_ids: []},
+                {op: 'set_theme', theme: 'light'},
+                {op: 'set_language', language: 'en'}
+            ])
+            .then(() => console.log('Настройки сброшены к значениям по умолчанию'))
+            .catch(error => console.error('Ошибка сброса настроек:', error))
+            .finally(() => location.reload());
         }
     );
 }
@@ -707,38 +705,58 @@ window.addEventListener('error', function(e) {
 
 window.addEventListener('load', logPerformance);
 
-function showTeamInfo(teamId) {
-    const teamCard = document.querySelector(`[data-team-id="${teamId}"]`);
-    if (!teamCard) return;
-    
-    const teamName = teamCard.querySelector('.team-name')?.textContent || 'Неизвестная команда';
-    const teamCity = teamCard.querySelector('.team-city')?.textContent || 'Неизвестный город';
-    const conference = teamCard.querySelector('.detail-value')?.textContent || 'Неизвестно';
-    
-    let modal = document.getElementById('teamModal');
-    if (!modal) {
-        createTeamModal();
-        modal = document.getElementById('teamModal');
+const teamDetailRequests = new Map();
+
+function fetchTeamDetail(teamId) {
+    const language = document.documentElement.lang || 'en';
+    const key = `${language}:${teamId}`;
+    if (!teamDetailRequests.has(key)) {
+        const request = fetch(`/teams/${teamId}/?lang=${encodeURIComponent(language)}`, {
+            headers: { 'Accept': 'application/json' }
+        }).then(response => {
+            if (!response.ok) {
+                throw new Error(`HTTP ${response.status}`);
+            }
+            return response.json();
+        });
+        request.catch(() => teamDetailRequests.delete(key));
+        teamDetailRequests.set(key, request);
     }
-    
-    const modalTeamName = modal.querySelector('#modalTeamName');
-    const modalTeamCity = modal.querySelector('#modalTeamCity');
-    const modalConference = modal.querySelector('#modalConference');
-    const modalTeamInitials = modal.querySelector('#modalTeamInitials');
-    
-    if (modalTeamName) modalTeamName.textContent = teamName;
-    if (modalTeamCity) modalTeamCity.textContent = teamCity;
-    if (modalConference) modalConference.textContent = conference;
-    if (modalTeamInitials) {
-        modalTeamInitials.textContent = teamName.slice(0, 2).toUpperCase();
-        const originalInitials = teamCard.querySelector('.team-initials');
-        if (originalInitials) {
-            const style = window.getComputedStyle(originalInitials);
-            modalTeamInitials.style.background = style.background;
+    return teamDetailRequests.get(key);
+}
+
+function showTeamInfo(teamId) {
+    fetchTeamDetail(teamId).then(team => {
+        let modal = document.getElementById('teamModal');
+        if (!modal) {
+            createTeamModal();
+            modal = document.getElementById('teamModal');
         }
-    }
-    
-    showModal('teamModal');
+        
+        const fields = {
+            '#modalTeamName': team.name,
+            '#modalTeamCity': team.city,
+            '#modalConference': team.conference_label,
+            '#modalDivision': team.division_label,
+            '#modalTeamDescription': team.about
+        };
+        Object.entries(fields).forEach(([selector, value]) => {
+            const element = modal.querySelector(selector);
+            if (element) element.textContent = value;
+        });
+        
+        const modalTeamInitials = modal.querySelector('#modalTeamInitials');
+        if (modalTeamInitials) {
+            const [color1, color2 = color1] = team.colors;
+            modalTeamInitials.textContent = '';
+            modalTeamInitials.style.background = `linear-gradient(135deg, ${color1}, ${color2})`;
+        }
+        
+        showModal('teamModal');
+    }).catch(error => {
+        console.error('Ошибка загрузки информации о команде:', error);
+        alert('Ошибка при загрузке информации о команде. Попробуйте еще раз.');
+    });
 }
 
 function createTeamModal() {
@@ -760,6 +778,7 @@ function createTeamModal() {
                         </p>
                         <div class="modal-team-badges">
                             <span id="modalConference" class="badge conference-badge">Конференция</span>
+                            <span id="modalDivision" class="badge division-badge">Дивизион</span>
                         </div>
                         <p id="modalTeamDescription" class="team-description">
                             Краткая информация об этой баскетбольной команде.
@@ -861,10 +880,29 @@ function initializeSearch() {
     }
 }
 
+const SEARCH_PAGE_SIZE = 24;
+// Только поля, которые рисует updateTeamsDisplay; ответ приходит колонками и строками.
+const SEARCH_FIELDS = 'id,name,city,conference,division,colors';
+let searchGeneration = 0;
+
 function performSearch(searchTerm) {
+    searchGeneration += 1;
+    loadSearchPage(searchTerm || '', null, searchGeneration);
+}
+
+function loadSearchPage(searchTerm, cursor, generation) {
     const csrftoken = getCookie('csrftoken');
+    const params = new URLSearchParams({
+        search: searchTerm,
+        limit: SEARCH_PAGE_SIZE,
+        fields: SEARCH_FIELDS,
+        format: 'compact'
+    });
+    if (cursor) {
+        params.set('cursor', cursor);
+    }
     
-    fetch(`/?search=${encodeURIComponent(searchTerm || '')}`, {
+    fetch(`/teams/search/?${params}`, {
         method: 'GET',
         headers: {
             'X-Requested-With': 'XMLHttpRequest',
@@ -873,22 +911,37 @@ function performSearch(searchTerm) {
     })
     .then(response => response.json())
     .then(data => {
-        updateTeamsDisplay(data.teams);
+        if (generation !== searchGeneration) {
+            return;
+        }
+        updateTeamsDisplay(decodeTeamRows(data), Boolean(cursor), data.favorites);
+        if (data.next_cursor) {
+            loadSearchPage(searchTerm, data.next_cursor, generation);
+        }
     })
     .catch(error => {
         console.error('Ошибка поиска:', error);
     });
 }
 
-function updateTeamsDisplay(teams) {
+function decodeTeamRows(data) {
+    if (!data.columns) {
+        return data.teams;
+    }
+    return data.teams.map(row => Object.fromEntries(data.columns.map((column, index) => [column, row[index]])));
+}
+
+function updateTeamsDisplay(teams, append = false, favorites = []) {
     const teamsGrid = document.querySelector('.teams-grid');
     if (!teamsGrid) return;
     
-    while (teamsGrid.firstChild) {
-        teamsGrid.removeChild(teamsGrid.firstChild);
+    if (!append) {
+        while (teamsGrid.firstChild) {
+            teamsGrid.removeChild(teamsGrid.firstChild);
+        }
     }
     
-    if (teams.length === 0) {
+    if (teams.length === 0 && !append) {
         const noTeamsMessage = document.createElement('div');
         noTeamsMessage.className = 'no-teams';
         noTeamsMessage.innerHTML = `
@@ -900,20 +953,9 @@ function updateTeamsDisplay(teams) {
         return;
     }
     
-    let favoriteList = [];
-    try {
-        const favoritesCookie = getCookie('favorite_teams');
-        console.log('Favorites cookie value:', favoritesCookie);
-        if (favoritesCookie) {
-            favoriteList = JSON.parse(favoritesCookie);
-            console.log('Favorite list from cookies:', favoriteList);
-        }
-    } catch (e) {
-        console.error('Ошибка при разборе избранных команд:', e);
-    }
-    
+    const favoriteIds = new Set(favorites);
     teams.forEach(team => {
-        const isFavorite = favoriteList.includes(team.id);
+        const isFavorite = favoriteIds.has(team.id);
         console.log(`Team ${team.id} is favorite: ${isFavorite}`);
         
         const teamCard = document.createElement('div');
@@ -965,36 +1007,85 @@ function updateTeamsDisplay(teams) {
         `;
         
         teamsGrid.appendChild(teamCard);
+        initializeTeamCardEvents(teamCard);
     });
     
-    initializeTeamCardEvents();
-    
     const currentFilter = sessionStorage.getItem('nbaFilter') || 'favorites';
     filterTeams(currentFilter);
 }
 
-function initializeTeamCardEvents() {
-    document.querySelectorAll('.team-initials[data-color1]').forEach(element => {
+let lastTouchTime = 0;
+
+// На сенсорных экранах двойное касание даёт второй click: повтор в течение 500 мс игнорируется.
+function isRepeatedTouch(e) {
+    if (!('ontouchstart' in window || navigator.maxTouchPoints > 0)) {
+        return false;
+    }
+    const now = Date.now();
+    if (now - lastTouchTime < 500) {
+        e.preventDefault();
+        return true;
+    }
+    lastTouchTime = now;
+    return false;
+}
+
+function initializeTeamCardEvents(scope = document) {
+    scope.querySelectorAll('.team-initials[data-color1]').forEach(element => {
         const color1 = element.dataset.color1;
         const color2 = element.dataset.color2;
         element.style.background = `linear-gradient(135deg, ${color1}, ${color2})`;
     });
     
-    document.querySelectorAll('.toggle-favorite-btn').forEach(btn => {
-        btn.addEventListener('click', function() {
+    scope.querySelectorAll('.toggle-favorite-btn').forEach(btn => {
+        btn.addEventListener('click', function(e) {
+            if (isRepeatedTouch(e)) return;
             const teamId = parseInt(this.dataset.teamId);
             toggleFavorite(teamId);
         });
     });
     
-    document.querySelectorAll('.team-info-btn').forEach(btn => {
-        btn.addEventListener('click', function() {
+    scope.querySelectorAll('.team-info-btn').forEach(btn => {
+        btn.addEventListener('click', function(e) {
+            if (isRepeatedTouch(e)) return;
             const teamId = parseInt(this.dataset.teamId);
             showTeamInfo(teamId);
         });
     });
 }
 
+let liveUpdates = null;
+
+function initializeLiveUpdates() {
+    if (!window.EventSource || !document.querySelector('.teams-grid')) return;
+    
+    // Фильтр по избранному задаётся cookie на момент подключения, поэтому после изменений переподключаемся.
+    if (liveUpdates) {
+        liveUpdates.close();
+    }
+    liveUpdates = new EventSource('/events/?teams=favorites');
+    ['score', 'standings', 'news'].forEach(kind => {
+        liveUpdates.addEventListener(kind, event => showLiveUpdate(kind, JSON.parse(event.data)));
+    });
+}
+
+function showLiveUpdate(kind, data) {
+    document.dispatchEvent(new CustomEvent('teamupdate', { detail: { kind: kind, ...data } }));
+    
+    const message = data.message || data.score;
+    if (!message || !data.team_id) return;
+    
+    document.querySelectorAll(`.team-card[data-team-id="${data.team_id}"]`).forEach(card => {
+        let badge = card.querySelector('.team-live-update');
+        if (!badge) {
+            badge = document.createElement('p');
+            badge.className = 'team-live-update';
+            card.querySelector('.team-city').after(badge);
+        }
+        badge.textContent = message;
+    });
+}
+
 function showNoFavoritesMessage() {
     let message = document.querySelector('.no-favorites-message');
     if (!message) {
@@ -1035,6 +1126,7 @@ function hideNoFavoritesMessage() {
 }
 
 window.toggleFavorite = toggleFavorite;
+window.sendPreferenceBatch = sendPreferenceBatch;
 window.previewTheme = previewTheme;
 window.showConfirmModal = showConfirmModal;
 window.closeModal = closeModal;